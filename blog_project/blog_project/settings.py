@@ -1,6 +1,9 @@
 import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Каталог изменяемых данных: общий кеш, метрики, профили шаблонов и
+# загрузки. Тесты берут временный каталог из test_settings.py
+DATA_DIR = BASE_DIR
 
 
 SECRET_KEY = '_+&kmk5_ow99urqz4(&wa7c2q!c50te$-!=-oyp=1&pd1@-cx('
@@ -40,6 +43,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.QueryLogMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.TemplateProfileMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,10 +59,32 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'blog_project.urls'
 
+# Проверка SQL-запросов представлений с бюджетом (core.queries):
+# 'warn' - в лог, 'raise' - исключением, None - не проверять.
+# Повтор одного SELECT QUERY_REPEAT_THRESHOLD раз считается N+1
+QUERY_INSPECTOR = 'warn' if DEBUG else None
+QUERY_REPEAT_THRESHOLD = 3
+# Доля запросов, для которых время по фазам (SQL, шаблоны, кеш,
+# миниатюры) уходит в заголовок Server-Timing и лог core.timing
+SERVER_TIMING_SAMPLE = 1.0 if DEBUG else 0.1
+# Метрики всех воркеров для Prometheus на /metrics (core.metrics):
+# процесс сбрасывает свои счётчики в общий файл раз в
+# METRICS_FLUSH_INTERVAL секунд; METRICS_ENABLED = False выключает сбор
+METRICS_ENABLED = True
+METRICS_PATH = os.path.join(DATA_DIR, 'metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 1
+# Профиль шаблонов и include (core.template_profile) в свёрнутых стеках
+# для flame graph: 'request' - файлы на каждый запрос, 'aggregate' -
+# сумма по процессу, None - выключен
+TEMPLATE_PROFILE = None
+TEMPLATE_PROFILE_DIR = os.path.join(DATA_DIR, 'template_profiles')
+# Как часто режим 'aggregate' переписывает файл суммы, секунды
+TEMPLATE_PROFILE_FLUSH_INTERVAL = 10
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,6 +104,18 @@ LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
 POSTS_PER_PAGE = 10
+# 'page' - нумерованные страницы, 'cursor' - переход по ключу (pub_date, id)
+POSTS_PAGINATION = 'page'
+# Сколько последних постов автора попадает в ленту при подписке
+FEED_BACKFILL = 100
+# 'push' - ленты раскладываются при публикации,
+# 'pull' - посты авторов с числом подписчиков от FEED_PUSH_THRESHOLD
+# подтягиваются из кешированных лент авторов при чтении
+FOLLOW_FEED_ENGINE = 'push'
+FEED_PUSH_THRESHOLD = 1000
+FEED_TIMELINE_LENGTH = 200
+FEED_TIMELINE_TIMEOUT = 60 * 60
+FEED_PULL_DEPTH = 800
 TITLE_SYMBOLS = 30
 
 WSGI_APPLICATION = 'blog_project.wsgi.application'
@@ -82,13 +124,33 @@ WSGI_APPLICATION = 'blog_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# SQLite в режиме WAL с настроенными PRAGMA (core.db_backends.sqlite3);
+# соединение живёт между запросами CONN_MAX_AGE секунд
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db_backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'pragmas': {
+                'synchronous': 'NORMAL',
+                'busy_timeout': 5000,
+                'cache_size': -64 * 1024,
+                'mmap_size': 256 * 1024 * 1024,
+            },
+        },
     }
 }
 
+# Записи из add_comment и подписок идут через поток-писатель процесса
+# (core.writes): пачки до WRITE_BATCH_SIZE задач в одной транзакции,
+# повтор при "database is locked" с паузой от WRITE_RETRY_DELAY секунд
+WRITE_QUEUE = True
+WRITE_BATCH_SIZE = 100
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 0.05
+WRITE_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -130,10 +192,51 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.path.join(DATA_DIR, 'media')
 
+# Миниатюры и варианты картинок строят фоновые потоки процесса
+# (posts.thumbnails)
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Ширины вариантов картинки поста для srcset; WebP строится, если Pillow
+# собран с libwebp
+IMAGE_VARIANT_WIDTHS = (300, 600, 1200)
+IMAGE_VARIANT_QUALITY = 80
+
+# Загрузки больше IMAGE_MAX_PIXELS отклоняются по заголовку, а длинная
+# сторона больших картинок уменьшается до IMAGE_MAX_SIDE (posts.ingest)
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+IMAGE_MAX_SIDE = 2048
+IMAGE_INGEST_QUALITY = 90
+
+# Общий для всех воркеров кеш в файле SQLite и LRU-кеш процесса перед ним
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 500,
+            'L1_TIMEOUT': 5,
+            'COHERENCE_INTERVAL': 0.5,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(DATA_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
 }
+
+# Страницы и фрагменты лент живут долго: ключ меняется вместе с версией
+# ленты, которую сдвигают сигналы Post, Comment и Follow
+FEED_PAGE_TIMEOUT = 6 * 60 * 60
+FEED_FRAGMENT_TIMEOUT = 60 * 60
+# Защита от одновременного пересчёта страниц (core.cache):
+# сколько живёт блокировка, сколько ждать чужого пересчёта при промахе
+# и сколько хранить устаревшую копию после окончания её свежести
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT = 2
+CACHE_STALE_TIMEOUT = 60 * 60
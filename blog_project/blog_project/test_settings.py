@@ -0,0 +1,26 @@
+"""Настройки тестов: manage.py test и pytest.
+
+Всё, что проект пишет на диск, уходит во временный каталог, а не в
+файлы разработчика рядом с проектом.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+DATA_DIR = tempfile.mkdtemp(prefix='blog_project_tests_')
+atexit.register(shutil.rmtree, DATA_DIR, ignore_errors=True)
+
+CACHES = {
+    **CACHES,
+    'shared': {
+        **CACHES['shared'],
+        'LOCATION': os.path.join(DATA_DIR, 'cache.sqlite3'),
+    },
+}
+METRICS_PATH = os.path.join(DATA_DIR, 'metrics.sqlite3')
+TEMPLATE_PROFILE_DIR = os.path.join(DATA_DIR, 'template_profiles')
+MEDIA_ROOT = os.path.join(DATA_DIR, 'media')
@@ -0,0 +1,103 @@
+import hashlib
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import (add_never_cache_headers, get_cache_key,
+                                has_vary_header, learn_cache_key,
+                                patch_response_headers)
+
+from . import metrics, timing
+
+LOCK_POLL_INTERVAL = 0.05
+
+# Счётчики процесса: hits, misses, stale_hits, lock_waits
+cache_stats = Counter()
+
+
+def _stat(name):
+    cache_stats[name] += 1
+    timing.count(f'page_{name}')
+    metrics.inc('page_cache_requests_total', {'result': name})
+
+
+def lock_key(request, key_prefix):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'stale_cache.lock.{key_prefix}.{url}'
+
+
+def _fresh(entry, version):
+    fresh_until, entry_version, _ = entry
+    return entry_version == version and time.time() < fresh_until
+
+
+def _store(request, response, timeout, cache, key_prefix, version):
+    if (
+        response.streaming
+        or response.status_code != 200
+        or 'private' in response.get('Cache-Control', '')
+        or (not request.COOKIES and response.cookies
+            and has_vary_header(response, 'Cookie'))
+    ):
+        return
+    stale_timeout = timeout + settings.CACHE_STALE_TIMEOUT
+    key = learn_cache_key(
+        request, response, stale_timeout, key_prefix, cache=cache
+    )
+    cache.set(key, (time.time() + timeout, version, response), stale_timeout)
+
+
+def _wait_for_entry(request, cache, key_prefix, version):
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        key = get_cache_key(request, key_prefix, 'GET', cache=cache)
+        entry = cache.get(key) if key else None
+        if entry is not None and _fresh(entry, version):
+            return entry[2]
+    return None
+
+
+def cached_response(view, request, args, kwargs, *, timeout, cache_alias,
+                    key_prefix, version=None, browser_timeout=None):
+    """Отдаёт ответ view из кеша, пересчитывая его одним процессом.
+
+    Запись считается свежей timeout секунд и пока совпадает version.
+    Пересчитывает только тот, кто взял короткую блокировку в кеше;
+    остальные в это время получают устаревшую копию, а если копии нет -
+    ждут пересчёта не дольше CACHE_LOCK_WAIT секунд.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return view(request, *args, **kwargs)
+    cache = caches[cache_alias]
+    key = get_cache_key(request, key_prefix, 'GET', cache=cache)
+    entry = cache.get(key) if key else None
+    if entry is not None and _fresh(entry, version):
+        _stat('hits')
+        return entry[2]
+    lock = lock_key(request, key_prefix)
+    locked = cache.add(lock, 1, settings.CACHE_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            _stat('stale_hits')
+            # Устаревшую копию клиент не должен сохранять под новым ETag
+            response = entry[2]
+            add_never_cache_headers(response)
+            return response
+        _stat('lock_waits')
+        response = _wait_for_entry(request, cache, key_prefix, version)
+        if response is not None:
+            return response
+    _stat('misses')
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response = response.render()
+        if browser_timeout is not None:
+            patch_response_headers(response, browser_timeout)
+        _store(request, response, timeout, cache, key_prefix, version)
+    finally:
+        if locked:
+            cache.delete(lock)
+    return response
@@ -0,0 +1,456 @@
+"""Кеш, общий для всех процессов сервера, без внешних сервисов.
+
+SQLiteCache хранит записи в файле SQLite в режиме WAL, поэтому
+его видят все воркеры и инвалидация доходит до каждого из них.
+TieredCache держит перед ним небольшой LRU-кеш в памяти процесса.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics, timing
+
+GENERATION_KEY = 'tiered:generation:{}'
+# Поколение L2 делится на части по хешу ключа: перезапись ключа
+# сбрасывает в чужих L1 только ключи его части
+GENERATION_BUCKETS = 64
+GENERATION_KEYS = [
+    GENERATION_KEY.format(bucket) for bucket in range(GENERATION_BUCKETS)
+]
+CULL_EVERY = 100
+
+
+class _Tier:
+    """L1 процесса. Общий для всех потоков, как хранилище LocMemCache."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Поколения частей на момент последней сверки
+        self.generations = None
+        self.checked = 0.0
+        self.stats = Counter()
+
+
+_tiers = {}
+
+
+def _bucket(key):
+    return zlib.crc32(key.encode()) % GENERATION_BUCKETS
+
+
+def _timed(method):
+    """Время операции идёт в фазу cache разбивки запроса."""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with timing.measure('cache'):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в файле SQLite. LOCATION - путь к файлу."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _alive(expires):
+        return expires is None or expires > time.time()
+
+    def _dump(self, value, timeout):
+        return (
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self.get_backend_timeout(timeout),
+        )
+
+    def _culled(self, connection):
+        self._writes += 1
+        if self._writes % CULL_EVERY:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE rowid IN '
+                '(SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            'SELECT value, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        rows = self._connection().execute(
+            'SELECT key, value, expires FROM cache WHERE key IN ({})'.format(
+                ', '.join('?' * len(keys))
+            ),
+            list(keys)
+        )
+        return {
+            keys[key]: pickle.loads(value)
+            for key, value, expires in rows if self._alive(expires)
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (key, *self._dump(value, timeout))
+        )
+        self._culled(connection)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                [
+                    (self._key(key, version), *self._dump(value, timeout))
+                    for key, value in data.items()
+                ]
+            )
+        self._culled(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time())
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, *self._dump(value, timeout))
+            ).rowcount
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return bool(self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ?',
+            (self.get_backend_timeout(timeout), key)
+        ).rowcount)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def delete(self, key, version=None):
+        self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def delete_many(self, keys, version=None):
+        self._connection().executemany(
+            'DELETE FROM cache WHERE key = ?',
+            [(self._key(key, version),) for key in keys]
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+class TieredCache(BaseCache):
+    """LRU-кеш процесса (L1) перед общим кешем (L2).
+
+    LOCATION - имя L1 внутри процесса, как у LocMemCache.
+    OPTIONS:
+        SHARED - алиас общего кеша из CACHES;
+        MAX_ENTRIES - сколько записей держать в L1;
+        L1_TIMEOUT - сколько секунд L1 доверяет прочитанному из L2;
+        COHERENCE_INTERVAL - как часто сверять поколение L2.
+
+    Перезапись, удаление и incr ключа увеличивают в L2 поколение его
+    части. Процесс, увидевший чужое поколение части, сбрасывает из L1
+    ключи этой части, так что чужие изменения становятся видны не позже
+    чем через COHERENCE_INTERVAL секунд. Новые ключи поколений не
+    трогают: их копий в чужих L1 нет.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared = options.get('SHARED', 'shared')
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._interval = options.get('COHERENCE_INTERVAL', 0.5)
+        self._tier = _tiers.setdefault(location, _Tier())
+        self.stats = self._tier.stats
+
+    def _hit(self, tier, count=1):
+        self.stats[f'{tier}_hits'] += count
+        timing.count('cache_hits', count)
+        metrics.inc('cache_requests_total', {'result': 'hit', 'tier': tier},
+                    count)
+
+    def _miss(self, count=1):
+        self.stats['misses'] += count
+        timing.count('cache_misses', count)
+        metrics.inc('cache_requests_total', {'result': 'miss'}, count)
+
+    @property
+    def shared(self):
+        if isinstance(self._shared, str):
+            return caches[self._shared]
+        return self._shared
+
+    def _key(self, key, version):
+        return self.shared.make_key(key, version=version)
+
+    def _flush(self, buckets=None):
+        """Сбрасывает L1 целиком или ключи частей buckets."""
+        entries = self._tier.entries
+        with self._tier.lock:
+            if buckets is None:
+                entries.clear()
+                return
+            for key in [key for key in entries if _bucket(key) in buckets]:
+                del entries[key]
+
+    def _sync(self):
+        tier = self._tier
+        now = time.monotonic()
+        if now - tier.checked < self._interval:
+            return
+        tier.checked = now
+        found = self.shared.get_many(GENERATION_KEYS)
+        generations = [found.get(key) for key in GENERATION_KEYS]
+        if tier.generations is None:
+            self._flush()
+        else:
+            changed = {
+                bucket for bucket, generation in enumerate(generations)
+                if generation != tier.generations[bucket]
+            }
+            if changed:
+                self._flush(changed)
+        tier.generations = generations
+
+    def _bump(self, keys=None):
+        """Сдвигает поколения частей ключей L2 keys, None - всех частей."""
+        buckets = (
+            range(GENERATION_BUCKETS) if keys is None
+            else {_bucket(key) for key in keys}
+        )
+        tier = self._tier
+        for bucket in buckets:
+            key = GENERATION_KEYS[bucket]
+            try:
+                generation = self.shared.incr(key)
+            except ValueError:
+                # Поколение от времени: после clear() счёт не начнётся
+                # заново с числа, которое другой процесс ещё помнит.
+                self.shared.add(key, time.time_ns(), None)
+                generation = self.shared.incr(key)
+            if tier.generations is None:
+                continue
+            previous = tier.generations[bucket]
+            if previous is None or generation != previous + 1:
+                self._flush({bucket})
+            tier.generations[bucket] = generation
+
+    def _remember(self, key, value, expires):
+        entries = self._tier.entries
+        with self._tier.lock:
+            entries[key] = (
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires
+            )
+            entries.move_to_end(key)
+            while len(entries) > self._max_entries:
+                entries.popitem(last=False)
+
+    def _forget(self, key):
+        with self._tier.lock:
+            self._tier.entries.pop(key, None)
+
+    def _local_get(self, key):
+        entries = self._tier.entries
+        with self._tier.lock:
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.time():
+                del entries[key]
+                return None
+            entries.move_to_end(key)
+        return entry
+
+    def _l1_expiry(self, timeout=DEFAULT_TIMEOUT):
+        expires = time.time() + self._l1_timeout
+        if timeout is DEFAULT_TIMEOUT:
+            return expires
+        backend_expires = self.get_backend_timeout(timeout)
+        if backend_expires is None:
+            return expires
+        return min(expires, backend_expires)
+
+    @_timed
+    def get(self, key, default=None, version=None):
+        self._sync()
+        local_key = self._key(key, version)
+        entry = self._local_get(local_key)
+        if entry is not None:
+            self._hit('l1')
+            return pickle.loads(entry[0])
+        value = self.shared.get(key, self, version)
+        if value is self:
+            self._miss()
+            return default
+        self._hit('l2')
+        self._remember(local_key, value, self._l1_expiry())
+        return value
+
+    @_timed
+    def get_many(self, keys, version=None):
+        self._sync()
+        found, missing = {}, []
+        for key in keys:
+            entry = self._local_get(self._key(key, version))
+            if entry is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(entry[0])
+        self._hit('l1', len(found))
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            self._hit('l2', len(shared))
+            self._miss(len(missing) - len(shared))
+            for key, value in shared.items():
+                self._remember(
+                    self._key(key, version), value, self._l1_expiry()
+                )
+            found.update(shared)
+        return found
+
+    @_timed
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._key(key, version)
+        # Новый ключ добавляется без сдвига поколения
+        if not self.shared.add(key, value, timeout, version):
+            self.shared.set(key, value, timeout, version)
+            self._bump([local_key])
+        self._remember(local_key, value, self._l1_expiry(timeout))
+
+    @_timed
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        existing = self.shared.get_many(list(data), version)
+        failed = self.shared.set_many(data, timeout, version)
+        if existing:
+            self._bump([self._key(key, version) for key in existing])
+        for key, value in data.items():
+            self._remember(self._key(key, version), value,
+                           self._l1_expiry(timeout))
+        return failed
+
+    @_timed
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._remember(self._key(key, version), value,
+                           self._l1_expiry(timeout))
+        return added
+
+    @_timed
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        local_key = self._key(key, version)
+        self._bump([local_key])
+        self._forget(local_key)
+        return value
+
+    @_timed
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._forget(self._key(key, version))
+        return self.shared.touch(key, timeout, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    @_timed
+    def delete(self, key, version=None):
+        self.shared.delete(key, version)
+        local_key = self._key(key, version)
+        self._bump([local_key])
+        self._forget(local_key)
+
+    @_timed
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version)
+        local_keys = [self._key(key, version) for key in keys]
+        self._bump(local_keys)
+        for local_key in local_keys:
+            self._forget(local_key)
+
+    def clear(self):
+        self.shared.clear()
+        self._tier.generations = None
+        self._bump()
+        self._flush()
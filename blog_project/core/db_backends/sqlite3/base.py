@@ -0,0 +1,61 @@
+"""SQLite для боевого режима: WAL, настроенные PRAGMA, долгие соединения.
+
+В режиме WAL читатели не ждут писателя, а писатель - читателей; при
+занятой базе соединение ждёт busy_timeout вместо немедленной ошибки
+"database is locked". PRAGMA задаются в OPTIONS['pragmas'] и
+выполняются при открытии каждого соединения, поэтому соединения держатся
+открытыми между запросами (CONN_MAX_AGE).
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # В WAL NORMAL не теряет целостность, только последние транзакции
+    # при отключении питания
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # BEGIN IMMEDIATE берёт блокировку записи в начале транзакции: ожидание
+    # других писателей укладывается в busy_timeout, а не обрывается
+    # ошибкой при первой записи после чтения (core.writes)
+    begin_immediate = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        return kwargs
+
+    @property
+    def pragmas(self):
+        return {
+            **DEFAULT_PRAGMAS,
+            **self.settings_dict['OPTIONS'].get('pragmas', {}),
+        }
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
+
+    def close(self):
+        # Совет SQLite для долгих соединений: обновить статистику
+        # планировщика перед закрытием
+        if self.connection is not None and not self.is_in_memory_db():
+            try:
+                self.connection.execute('PRAGMA optimize')
+            except base.Database.Error:
+                pass
+        super().close()
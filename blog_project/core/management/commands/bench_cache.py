@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from itertools import accumulate
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends import SQLiteCache, TieredCache
+
+VALUE_SIZE = 2048
+ZIPF_EXPONENT = 1.1
+
+
+def make_backend(kind, path):
+    if kind == 'locmem':
+        return LocMemCache('bench', {'OPTIONS': {'MAX_ENTRIES': 100000}})
+    shared = SQLiteCache(path, {'OPTIONS': {'MAX_ENTRIES': 100000}})
+    if kind == 'sqlite':
+        return shared
+    return TieredCache('bench', {'OPTIONS': {
+        'SHARED': shared, 'MAX_ENTRIES': 500, 'L1_TIMEOUT': 5,
+        'COHERENCE_INTERVAL': 0.5,
+    }})
+
+
+def run_worker(args):
+    kind, path, keys, operations, write_ratio, seed = args
+    backend = make_backend(kind, path)
+    weights = list(accumulate(1 / (i + 1) ** ZIPF_EXPONENT
+                              for i in range(keys)))
+    rng = random.Random(seed)
+    value = b'x' * VALUE_SIZE
+    latencies, hits, reads = [], 0, 0
+    for key in rng.choices(range(keys), cum_weights=weights, k=operations):
+        key = f'key:{key}'
+        if rng.random() < write_ratio:
+            backend.set(key, value, 600)
+            continue
+        reads += 1
+        start = time.perf_counter()
+        found = backend.get(key)
+        latencies.append(time.perf_counter() - start)
+        if found is None:
+            backend.set(key, value, 600)
+        else:
+            hits += 1
+    tiers = dict(getattr(backend, 'stats', {}))
+    return latencies, hits, reads, tiers
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает долю попаданий и задержку чтения кеша locmem, '
+        'общего SQLiteCache и TieredCache (L1 + SQLite) '
+        'при нескольких процессах-воркерах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--keys', type=int, default=5000)
+        parser.add_argument('--operations', type=int, default=20000)
+        parser.add_argument('--write-ratio', type=float, default=0.02)
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        context = multiprocessing.get_context('fork')
+        with tempfile.TemporaryDirectory() as directory:
+            for kind in ('locmem', 'sqlite', 'tiered'):
+                path = os.path.join(directory, f'{kind}.sqlite3')
+                jobs = [
+                    (kind, path, options['keys'], options['operations'],
+                     options['write_ratio'], seed)
+                    for seed in range(workers)
+                ]
+                with context.Pool(workers) as pool:
+                    results = pool.map(run_worker, jobs)
+                self.report(kind, results)
+
+    def report(self, kind, results):
+        latencies = sorted(
+            latency for result in results for latency in result[0]
+        )
+        hits = sum(result[1] for result in results)
+        reads = sum(result[2] for result in results)
+        line = (
+            f'{kind:>7}: hit ratio {hits / reads:6.1%}, '
+            f'p50 {statistics.median(latencies) * 1e6:7.1f} us, '
+            f'p95 {latencies[int(len(latencies) * 0.95)] * 1e6:7.1f} us'
+        )
+        l1_hits = sum(result[3].get('l1_hits', 0) for result in results)
+        if l1_hits:
+            line += f', L1 share of hits {l1_hits / hits:6.1%}'
+        self.stdout.write(line)
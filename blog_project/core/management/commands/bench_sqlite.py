@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+# Таблицы повторяют колонки и индексы постов и комментариев блога
+SCHEMA = (
+    'CREATE TABLE bench_user (id INTEGER PRIMARY KEY, username TEXT)',
+    'CREATE TABLE bench_post (id INTEGER PRIMARY KEY, text TEXT NOT NULL, '
+    'author_id INTEGER NOT NULL, pub_date DATETIME NOT NULL, '
+    'comment_count INTEGER NOT NULL DEFAULT 0)',
+    'CREATE INDEX bench_post_author ON bench_post (author_id, pub_date DESC)',
+    'CREATE TABLE bench_comment (id INTEGER PRIMARY KEY, '
+    'post_id INTEGER NOT NULL, author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, pub_date DATETIME NOT NULL)',
+    'CREATE INDEX bench_comment_post ON bench_comment (post_id, pub_date)',
+)
+READ_SQL = (
+    'SELECT p.id, p.text, p.pub_date, p.comment_count, u.username '
+    'FROM bench_post p JOIN bench_user u ON u.id = p.author_id '
+    'WHERE p.author_id = %s ORDER BY p.pub_date DESC LIMIT 10'
+)
+AUTHORS = 50
+SEED_POSTS = 20000
+
+
+def modes():
+    """Конфигурации базы: как было и как в settings.DATABASES."""
+    tuned = settings.DATABASES['default']
+    return {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {},
+        },
+        'tuned': {
+            'ENGINE': tuned['ENGINE'],
+            'CONN_MAX_AGE': tuned.get('CONN_MAX_AGE', 0),
+            'OPTIONS': tuned.get('OPTIONS', {}),
+        },
+    }
+
+
+def prepare(alias, mode, path):
+    connections.databases[alias] = {**mode, 'NAME': path}
+    now = timezone.now()
+    with transaction.atomic(using=alias), connections[alias].cursor() as c:
+        for statement in SCHEMA:
+            c.execute(statement)
+        c.executemany(
+            'INSERT INTO bench_user (id, username) VALUES (%s, %s)',
+            [(pk, f'author{pk}') for pk in range(1, AUTHORS + 1)]
+        )
+        c.executemany(
+            'INSERT INTO bench_post (text, author_id, pub_date) '
+            'VALUES (%s, %s, %s)',
+            [
+                (f'Пост {i}', i % AUTHORS + 1, now)
+                for i in range(SEED_POSTS)
+            ]
+        )
+    connections[alias].close()
+
+
+def read(cursor, rng):
+    cursor.execute(READ_SQL, [rng.randint(1, AUTHORS)])
+    cursor.fetchall()
+
+
+def write(cursor, rng):
+    # Как post_create и add_comment: пост, комментарий и счётчик
+    author = rng.randint(1, AUTHORS)
+    now = timezone.now()
+    cursor.execute(
+        'INSERT INTO bench_post (text, author_id, pub_date) '
+        'VALUES (%s, %s, %s)',
+        ['Новый пост', author, now]
+    )
+    post_id = cursor.lastrowid
+    cursor.execute(
+        'INSERT INTO bench_comment (post_id, author_id, text, pub_date) '
+        'VALUES (%s, %s, %s, %s)',
+        [post_id, author, 'Комментарий', now]
+    )
+    cursor.execute(
+        'UPDATE bench_post SET comment_count = comment_count + 1 '
+        'WHERE id = %s',
+        [post_id]
+    )
+
+
+def run_worker(args):
+    alias, mode, path, role, seconds, seed = args
+    connections.databases[alias] = {**mode, 'NAME': path}
+    connection = connections[alias]
+    operation = read if role == 'read' else write
+    persistent = mode['CONN_MAX_AGE'] != 0
+    rng = random.Random(seed)
+    done = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with transaction.atomic(using=alias), connection.cursor() as c:
+                operation(c, rng)
+            done += 1
+        except OperationalError:
+            errors += 1
+        if not persistent:
+            # Как при CONN_MAX_AGE = 0: соединение на каждый запрос
+            connection.close()
+    connection.close()
+    return role, done, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность чтения и записи SQLite '
+        'при нескольких процессах: настройки по умолчанию против '
+        'settings.DATABASES (WAL, PRAGMA, долгие соединения).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        roles = (
+            ['read'] * options['readers'] + ['write'] * options['writers']
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, mode in modes().items():
+                alias = f'bench_{name}'
+                path = os.path.join(directory, f'{name}.sqlite3')
+                prepare(alias, mode, path)
+                # Соединения родителя не должны переживать fork
+                connections.close_all()
+                jobs = [
+                    (alias, mode, path, role, options['seconds'], seed)
+                    for seed, role in enumerate(roles)
+                ]
+                with context.Pool(len(jobs)) as pool:
+                    results = pool.map(run_worker, jobs)
+                self.report(name, results, options['seconds'])
+
+    def report(self, name, results, seconds):
+        line = []
+        for role in ('read', 'write'):
+            done = sum(r[1] for r in results if r[0] == role)
+            errors = sum(r[2] for r in results if r[0] == role)
+            line.append(
+                f'{role} {done / seconds:9.1f} оп/с '
+                f'(ошибок {errors})'
+            )
+        self.stdout.write(f'{name:>7}: ' + ', '.join(line))
@@ -0,0 +1,241 @@
+"""Метрики в текстовом формате Prometheus, общие для всех воркеров.
+
+Процесс копит приращения счётчиков в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд прибавляет их к строкам файла SQLite
+METRICS_PATH (UPSERT value = value + приращение). Страница /metrics
+читает суммы из файла, поэтому видит все процессы сервера, а внешний
+сервис для сбора не нужен.
+"""
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# имя -> (тип, описание)
+FAMILIES = {
+    'http_request_duration_seconds': (
+        'histogram', 'Время ответа по представлениям.'
+    ),
+    'http_responses_total': (
+        'counter', 'Ответы по представлениям и кодам статуса.'
+    ),
+    'db_queries_per_request': (
+        'histogram', 'Число SQL-запросов на запрос по представлениям.'
+    ),
+    'cache_requests_total': (
+        'counter', 'Чтения TieredCache: попадания в L1, L2 и промахи.'
+    ),
+    'page_cache_requests_total': (
+        'counter', 'Страницы из кеша лент: hits, stale_hits, misses.'
+    ),
+    'thumbnails_generated_total': (
+        'counter', 'Построенные в фоне миниатюры и варианты картинок.'
+    ),
+    'write_queue_jobs_total': ('counter', 'Задачи записи (core.writes).'),
+    'write_queue_batches_total': (
+        'counter', 'Транзакции потока-писателя.'
+    ),
+    'write_queue_retries_total': (
+        'counter', 'Повторы пачек записи после "database is locked".'
+    ),
+    'write_queue_failures_total': (
+        'counter', 'Задачи записи, завершившиеся ошибкой.'
+    ),
+    'write_queue_wait_seconds_total': (
+        'counter', 'Суммарное ожидание задач в очереди записи.'
+    ),
+}
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+LE = re.compile(r'(?:^|,)le="([^"]*)"')
+RESULT = re.compile(r'(?:^|,)result="([^"]*)"')
+
+_pending = Counter()
+_lock = threading.Lock()
+_local = threading.local()
+_flushed = time.monotonic()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n'
+    )
+
+
+def _labels(labels):
+    return ','.join(
+        f'{name}="{_escape(value)}"' for name, value in sorted(labels.items())
+    )
+
+
+def _bound(bound):
+    return '+Inf' if math.isinf(bound) else repr(float(bound))
+
+
+def inc(name, labels=None, value=1):
+    with _lock:
+        _pending[name, _labels(labels or {})] += value
+
+
+def observe(name, value, buckets, labels=None):
+    """Наблюдение для гистограммы: корзины le, _sum и _count."""
+    labels = labels or {}
+    with _lock:
+        for bound in (*buckets, math.inf):
+            # Пустые корзины тоже попадают в файл: в гистограмме есть все
+            key = _labels({**labels, 'le': _bound(bound)})
+            _pending[f'{name}_bucket', key] += int(value <= bound)
+        key = _labels(labels)
+        _pending[f'{name}_sum', key] += value
+        _pending[f'{name}_count', key] += 1
+
+
+def _connection():
+    connection = getattr(_local, 'connection', None)
+    path = settings.METRICS_PATH
+    if (
+        connection is None or _local.pid != os.getpid()
+        or _local.path != path
+    ):
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS metrics (name TEXT NOT NULL, '
+            'labels TEXT NOT NULL, value REAL NOT NULL, '
+            'PRIMARY KEY (name, labels))'
+        )
+        _local.connection = connection
+        _local.pid = os.getpid()
+        _local.path = path
+    return connection
+
+
+def flush(force=False):
+    """Переносит накопленные приращения процесса в общий файл."""
+    global _flushed
+    now = time.monotonic()
+    if not force and now - _flushed < settings.METRICS_FLUSH_INTERVAL:
+        return
+    with _lock:
+        _flushed = now
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return
+    try:
+        with _connection() as connection:
+            connection.executemany(
+                'INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (name, labels) '
+                'DO UPDATE SET value = value + excluded.value',
+                [(name, labels, value)
+                 for (name, labels), value in pending.items()]
+            )
+    except sqlite3.Error:
+        # Приращения не теряются: уйдут со следующим сбросом
+        with _lock:
+            _pending.update(pending)
+        logger.warning('Не удалось сохранить метрики', exc_info=True)
+
+
+def reset():
+    """Удаляет все накопленные значения (для тестов)."""
+    with _lock:
+        _pending.clear()
+    with _connection() as connection:
+        connection.execute('DELETE FROM metrics')
+
+
+def collect():
+    """Суммы всех процессов: {имя: {метки: значение}}."""
+    flush(force=True)
+    values = defaultdict(dict)
+    for name, labels, value in _connection().execute(
+        'SELECT name, labels, value FROM metrics'
+    ):
+        values[name][labels] = value
+    return values
+
+
+def _family(name):
+    if name in FAMILIES:
+        return name
+    for suffix in HISTOGRAM_SUFFIXES:
+        if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+            return name[:-len(suffix)]
+    return name
+
+
+def _sort_key(item):
+    """Ряды одних меток вместе: корзины по возрастанию le, _sum, _count."""
+    (name, labels), _ = item
+    match = LE.search(labels)
+    suffix = next(
+        (i for i, suffix in enumerate(HISTOGRAM_SUFFIXES)
+         if name.endswith(suffix)), 0
+    )
+    return (
+        LE.sub('', labels).strip(','), suffix,
+        float(match.group(1)) if match else 0.0,
+    )
+
+
+def _hit_ratios(values):
+    """Доли попаданий по счётчикам кешей - gauge cache_hit_ratio."""
+    ratios = {}
+    for cache, name, hits, misses in (
+        ('tiered', 'cache_requests_total', ('hit',), ('miss',)),
+        ('page', 'page_cache_requests_total',
+         ('hits', 'stale_hits'), ('misses',)),
+    ):
+        counts = Counter()
+        for labels, value in values.get(name, {}).items():
+            match = RESULT.search(labels)
+            if match:
+                counts[match.group(1)] += value
+        found = sum(counts[result] for result in hits)
+        total = found + sum(counts[result] for result in misses)
+        if total:
+            ratios[f'cache="{cache}"'] = found / total
+    return ratios
+
+
+def _number(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render():
+    """Текст страницы /metrics (формат Prometheus 0.0.4)."""
+    values = collect()
+    families = defaultdict(dict)
+    for name, series in values.items():
+        for labels, value in series.items():
+            families[_family(name)][name, labels] = value
+    lines = []
+    for family in sorted(families):
+        kind, help_text = FAMILIES.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for (name, labels), value in sorted(
+            families[family].items(), key=_sort_key
+        ):
+            series = f'{name}{{{labels}}}' if labels else name
+            lines.append(f'{series} {_number(value)}')
+    ratios = _hit_ratios(values)
+    if ratios:
+        lines.append('# HELP cache_hit_ratio Доля чтений кеша с попаданием.')
+        lines.append('# TYPE cache_hit_ratio gauge')
+        for labels, ratio in sorted(ratios.items()):
+            lines.append(f'cache_hit_ratio{{{labels}}} {ratio:.4f}')
+    return '\n'.join(lines) + '\n'
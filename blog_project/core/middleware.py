@@ -0,0 +1,177 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, template_profile, timing
+from .queries import QueryBudgetError, QueryLog
+
+logger = logging.getLogger(__name__)
+
+
+def query_log(request):
+    """QueryLog запроса от QueryLogMiddleware или None без него."""
+    return getattr(request, 'query_log', None)
+
+
+class QueryLogMiddleware:
+    """Один QueryLog на весь запрос в request.query_log.
+
+    Стоит в MIDDLEWARE первым: метрики, Server-Timing и бюджеты
+    запросов читают SQL из него, а не ставят каждый свою обёртку
+    execute_wrapper. Не включается, если все они выключены.
+    """
+
+    def __init__(self, get_response):
+        if not (
+            settings.METRICS_ENABLED or settings.SERVER_TIMING_SAMPLE
+            or settings.QUERY_INSPECTOR
+        ):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryLog() as request.query_log:
+            return self.get_response(request)
+
+
+class MetricsMiddleware:
+    """Время ответа, статус и число SQL-запросов каждого ответа.
+
+    Метки - имя представления из resolver_match; адреса без
+    представления попадают под view="unmatched". Раз в
+    METRICS_FLUSH_INTERVAL секунд накопленное уходит в общий файл.
+    При METRICS_ENABLED = False не включается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        view = {'view': match.view_name if match else 'unmatched'}
+        metrics.observe(
+            'http_request_duration_seconds',
+            time.perf_counter() - started, metrics.LATENCY_BUCKETS, view,
+        )
+        log = query_log(request)
+        if log is not None:
+            metrics.observe(
+                'db_queries_per_request', len(log), metrics.QUERY_BUCKETS,
+                view,
+            )
+        metrics.inc(
+            'http_responses_total', {**view, 'status': response.status_code}
+        )
+        metrics.flush()
+        return response
+
+
+class ServerTimingMiddleware:
+    """Разбивка времени запроса в заголовке Server-Timing и в логе.
+
+    Замеряется доля запросов SERVER_TIMING_SAMPLE (0 - ни одного,
+    1 - все). Строка key=value уходит в лог core.timing с уровнем INFO,
+    те же поля - в record.timing для структурных форматтеров.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = settings.SERVER_TIMING_SAMPLE
+        if not sample or (sample < 1 and random.random() >= sample):
+            return self.get_response(request)
+        breakdown = timing.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.stop()
+        total = time.perf_counter() - started
+        log = query_log(request)
+        if log is not None:
+            breakdown.add('sql', sum(seconds for _, seconds in log.queries))
+            breakdown.counts['sql_count'] = len(log)
+        response['Server-Timing'] = breakdown.header(total)
+        match = request.resolver_match
+        fields = {
+            'view': match.view_name if match else '-',
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            **breakdown.fields(),
+        }
+        timing.logger.info(
+            ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra={'timing': fields},
+        )
+        return response
+
+
+class QueryBudgetMiddleware:
+    """Сверяет SQL-запросы ответа с бюджетом его представления.
+
+    Проверяются представления, объявившие бюджет через query_budget.
+    QUERY_INSPECTOR = 'warn' пишет нарушения в лог, 'raise' поднимает
+    QueryBudgetError (так их ловят тесты), None выключает проверку.
+    Запросы берутся из QueryLogMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        mode = settings.QUERY_INSPECTOR
+        log = query_log(request)
+        if not mode or log is None:
+            return response
+        match = request.resolver_match
+        budget = getattr(match.func, 'query_budget', None) if match else None
+        if budget is None:
+            return response
+        problems = log.problems(budget, settings.QUERY_REPEAT_THRESHOLD)
+        if problems:
+            message = f'{request.method} {request.path}: ' + '; '.join(
+                problems
+            )
+            if mode == 'raise':
+                raise QueryBudgetError(message)
+            logger.warning(message)
+        return response
+
+
+class TemplateProfileMiddleware:
+    """Профиль шаблонов каждого запроса (core.template_profile).
+
+    Работает только при заданном TEMPLATE_PROFILE, иначе Django не
+    включает его в цепочку вовсе.
+    """
+
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_PROFILE:
+            raise MiddlewareNotUsed
+        template_profile.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        template_profile.start('unmatched')
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = template_profile.stop()
+        if profile.folded:
+            template_profile.save(profile)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = template_profile.current()
+        if profile is not None:
+            profile.root = request.resolver_match.view_name
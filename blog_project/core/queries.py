@@ -0,0 +1,87 @@
+"""SQL-запросы, сделанные за один запрос к сайту.
+
+QueryLog записывает все запросы ко всем базам. Повтор одного и того же
+SELECT с разными параметрами - признак запроса на каждую строку (N+1).
+Представления объявляют бюджет запросов декоратором query_budget, а
+QueryBudgetMiddleware сверяет с ним каждый ответ.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Литералы, которые Django подставляет в SQL сам: LIMIT, списки IN
+PLACEHOLDER = re.compile(r"%s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST = re.compile(r'\(\?(?:, \?)*\)')
+
+
+class QueryBudgetError(Exception):
+    """Представление превысило бюджет или повторяет запрос на строку."""
+
+
+def shape(sql):
+    """SQL без значений: запросы одной формы различаются только ими."""
+    sql = ' '.join(PLACEHOLDER.sub('?', sql).split())
+    return IN_LIST.sub('(...)', sql)
+
+
+class QueryLog:
+    """Запросы ко всем базам внутри блока with: (sql, секунды)."""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeats(self, threshold):
+        """Формы SELECT, выполненные не меньше threshold раз."""
+        shapes = Counter(
+            shape(sql) for sql, _ in self.queries
+            if sql.lstrip().upper().startswith('SELECT')
+        )
+        return [
+            (query, count) for query, count in shapes.most_common()
+            if count >= threshold
+        ]
+
+    def problems(self, budget, threshold):
+        """Описания нарушений: сверх бюджета и повторы одной формы."""
+        found = []
+        if budget is not None and len(self) > budget:
+            found.append(f'{len(self)} запросов при бюджете {budget}')
+        found += [
+            f'{count} раз: {query}'
+            for query, count in self.repeats(threshold)
+        ]
+        return found
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может сделать представление."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
@@ -0,0 +1,203 @@
+"""Профиль отрисовки шаблонов: время каждого шаблона и include.
+
+Включается настройкой TEMPLATE_PROFILE. install() оборачивает
+Template._render движка Django, через который проходят и страницы, и
+{% include %}, и родители {% extends %}; без открытого профиля обёртка
+сразу вызывает исходный метод.
+
+Профиль пишется в TEMPLATE_PROFILE_DIR в свёрнутом формате стеков
+flamegraph.pl и speedscope: строка "представление;шаблон;include
+микросекунды" с собственным временем кадра. Рядом - таблица с числом
+вызовов, полным и собственным временем и временем на вызов. В режиме
+'request' файлы пишутся на каждый запрос, в режиме 'aggregate' процесс
+копит сумму по всем запросам в памяти и пишет её в aggregate-<pid> не чаще
+раза в TEMPLATE_PROFILE_FLUSH_INTERVAL секунд и при выходе; файлы
+разных процессов можно просто склеить.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.template.base import Template
+
+REQUEST_MODE = 'request'
+AGGREGATE_MODE = 'aggregate'
+STRING_TEMPLATE = '<string>'
+
+_local = threading.local()
+_aggregate = None
+_written = 0.0
+_lock = threading.Lock()
+
+
+class Profile:
+    def __init__(self, root):
+        self.root = root
+        self._stack = []
+        # путь стека -> собственное время, секунды
+        self.folded = Counter()
+        # шаблон -> [вызовы, полное время, собственное время]
+        self.stats = defaultdict(lambda: [0, 0.0, 0.0])
+
+    def enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def leave(self):
+        name, started, children = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        own = elapsed - children
+        path = ';'.join([self.root, *(frame[0] for frame in self._stack),
+                         name])
+        self.folded[path] += own
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        stats = self.stats[name]
+        stats[0] += 1
+        stats[2] += own
+        # Шаблон, вложенный в себя, не считает своё время дважды
+        if all(frame[0] != name for frame in self._stack):
+            stats[1] += elapsed
+
+    def merge(self, other):
+        self.folded.update(other.folded)
+        for name, (calls, total, own) in other.stats.items():
+            stats = self.stats[name]
+            stats[0] += calls
+            stats[1] += total
+            stats[2] += own
+
+    def flamegraph(self):
+        return ''.join(
+            f'{path} {round(seconds * 1e6)}\n'
+            for path, seconds in sorted(self.folded.items())
+        )
+
+    def summary(self):
+        lines = [
+            f'{"шаблон":<50} {"вызовы":>8} {"всего мс":>10} '
+            f'{"своё мс":>10} {"мс/вызов":>10}'
+        ]
+        for name, (calls, total, own) in sorted(
+            self.stats.items(), key=lambda item: -item[1][1]
+        ):
+            lines.append(
+                f'{name:<50} {calls:>8} {total * 1000:>10.2f} '
+                f'{own * 1000:>10.2f} {total * 1000 / calls:>10.3f}'
+            )
+        return '\n'.join(lines) + '\n'
+
+    def write(self, name):
+        """Пишет name.folded и name.txt в TEMPLATE_PROFILE_DIR."""
+        directory = settings.TEMPLATE_PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+        for suffix, content in (
+            ('.folded', self.flamegraph()), ('.txt', self.summary()),
+        ):
+            # Сумму может писать и flush() при выходе, и поток запроса
+            temp = (
+                f'{base}{suffix}.{os.getpid()}.{threading.get_ident()}.tmp'
+            )
+            with open(temp, 'w') as file_:
+                file_.write(content)
+            os.replace(temp, base + suffix)
+        return base
+
+
+def _template_name(template):
+    origin = getattr(template, 'origin', None)
+    return (
+        getattr(origin, 'template_name', None) or template.name
+        or STRING_TEMPLATE
+    )
+
+
+def _profiled(render):
+    @wraps(render)
+    def wrapper(self, context):
+        profile = current()
+        if profile is None:
+            return render(self, context)
+        profile.enter(_template_name(self))
+        try:
+            return render(self, context)
+        finally:
+            profile.leave()
+    wrapper.profiled = True
+    return wrapper
+
+
+def install():
+    """Оборачивает Template._render, если он ещё не обёрнут.
+
+    Вызывается при загрузке middleware, то есть после того, как
+    тестовое окружение подменило _render своим.
+    """
+    if not getattr(Template._render, 'profiled', False):
+        Template._render = _profiled(Template._render)
+
+
+def current():
+    return getattr(_local, 'profile', None)
+
+
+def start(root):
+    _local.profile = Profile(root)
+    return _local.profile
+
+
+def stop():
+    profile, _local.profile = getattr(_local, 'profile', None), None
+    return profile
+
+
+def _snapshot():
+    """Копия накопленного профиля; вызывается под _lock."""
+    global _written
+    _written = time.monotonic()
+    snapshot = Profile(AGGREGATE_MODE)
+    snapshot.merge(_aggregate)
+    return snapshot
+
+
+def flush():
+    """Пишет накопленный профиль процесса. Возвращает путь или None."""
+    with _lock:
+        if _aggregate is None:
+            return None
+        snapshot = _snapshot()
+    return snapshot.write(f'aggregate-{os.getpid()}')
+
+
+atexit.register(flush)
+
+
+def save(profile):
+    """Сохраняет профиль запроса по TEMPLATE_PROFILE.
+
+    Возвращает путь записанных файлов или None, если профиль только
+    добавлен к сумме процесса.
+    """
+    global _aggregate, _written
+    if settings.TEMPLATE_PROFILE == AGGREGATE_MODE:
+        with _lock:
+            if _aggregate is None:
+                _aggregate = Profile(AGGREGATE_MODE)
+                _written = time.monotonic()
+            _aggregate.merge(profile)
+            # Файл пишется вне блокировки: запросы её почти не ждут
+            snapshot = None
+            if (
+                time.monotonic() - _written
+                >= settings.TEMPLATE_PROFILE_FLUSH_INTERVAL
+            ):
+                snapshot = _snapshot()
+        if snapshot is None:
+            return None
+        return snapshot.write(f'aggregate-{os.getpid()}')
+    view = profile.root.replace(':', '_').replace(os.sep, '_')
+    return profile.write(f'{time.time_ns()}-{view}')
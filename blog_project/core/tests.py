@@ -1,6 +1,28 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
 from http import HTTPStatus
 
-from django.test import Client, TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import ResolverMatch, reverse
+
+from posts.models import Post
+
+from core import metrics, template_profile, writes
+from core.cache import cache_stats, cached_response, lock_key
+from core.cache_backends import SQLiteCache, TieredCache
+from core.middleware import (MetricsMiddleware, QueryBudgetMiddleware,
+                             QueryLogMiddleware, ServerTimingMiddleware)
+from core.queries import QueryBudgetError, query_budget, shape
+
+User = get_user_model()
 
 
 class PostURLTests(TestCase):
@@ -17,3 +39,471 @@ class PostURLTests(TestCase):
         response = self.guest_client.get('/unexisting_page/')
         template = 'core/404.html'
         self.assertTemplateUsed(response, template)
+
+
+class StaleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_stats.clear()
+        self.calls = 0
+        self.request = RequestFactory().get('/page/')
+
+    def view(self, request):
+        self.calls += 1
+        return HttpResponse(f'render {self.calls}')
+
+    def get(self, version=1):
+        return cached_response(
+            self.view, self.request, (), {},
+            timeout=60, cache_alias='default', key_prefix='test',
+            version=version,
+        ).content
+
+    def test_hit_after_miss(self):
+        """Повторный запрос отдаётся из кеша."""
+        self.assertEqual(self.get(), self.get())
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(cache_stats['misses'], 1)
+        self.assertEqual(cache_stats['hits'], 1)
+
+    def test_stale_copy_while_locked(self):
+        """Пока другой процесс пересчитывает, отдаётся прошлая версия."""
+        first = self.get(version=1)
+        cache.add(lock_key(self.request, 'test'), 1)
+        self.assertEqual(self.get(version=2), first)
+        self.assertEqual(cache_stats['stale_hits'], 1)
+        cache.delete(lock_key(self.request, 'test'))
+        self.assertNotEqual(self.get(version=2), first)
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(CACHE_LOCK_WAIT=0.1)
+    def test_lock_wait_without_copy(self):
+        """Без копии запрос ждёт пересчёта, а затем считает сам."""
+        cache.add(lock_key(self.request, 'test'), 1)
+        self.assertEqual(self.get(), b'render 1')
+        self.assertEqual(cache_stats['lock_waits'], 1)
+        self.assertEqual(cache_stats['misses'], 1)
+
+
+class SharedCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def tiered(self, name):
+        """Отдельный L1 с общим L2, как у другого процесса."""
+        return TieredCache(name, {'OPTIONS': {
+            'SHARED': SQLiteCache(self.path, {}),
+            'COHERENCE_INTERVAL': 0,
+        }})
+
+    def test_sqlite_cache_operations(self):
+        """SQLiteCache поддерживает add, incr и срок жизни записей."""
+        shared = SQLiteCache(self.path, {})
+        self.assertTrue(shared.add('key', 1))
+        self.assertFalse(shared.add('key', 2))
+        self.assertEqual(shared.incr('key', 5), 6)
+        shared.set('gone', 'value', -1)
+        self.assertIsNone(shared.get('gone'))
+        self.assertTrue(shared.add('gone', 'again'))
+        self.assertEqual(
+            shared.get_many(['key', 'gone', 'missing']),
+            {'key': 6, 'gone': 'again'}
+        )
+        with self.assertRaises(ValueError):
+            shared.incr('missing')
+
+    def test_tiered_cache_is_coherent(self):
+        """Запись одного процесса видна другому, несмотря на его L1."""
+        first, second = self.tiered('first'), self.tiered('second')
+        first.set('key', 'old')
+        self.assertEqual(second.get('key'), 'old')
+        self.assertEqual(second.get('key'), 'old')
+        self.assertEqual(second.stats['l1_hits'], 1)
+        first.set('key', 'new')
+        self.assertEqual(second.get('key'), 'new')
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+
+    def test_new_keys_keep_other_l1(self):
+        """Запись новых ключей не сбрасывает L1 других процессов."""
+        first, second = self.tiered('writer'), self.tiered('reader')
+        first.set('key', 'value')
+        second.get('key')
+        first.set('other', 'value')
+        first.add('third', 'value')
+        first.set_many({'fourth': 1, 'fifth': 2})
+        self.assertEqual(second.get('key'), 'value')
+        self.assertEqual(second.stats['l1_hits'], 1)
+        first.set_many({'key': 'changed'})
+        self.assertEqual(second.get('key'), 'changed')
+
+    def test_l1_returns_copies(self):
+        """L1 отдаёт копию, а не общий изменяемый объект."""
+        cache = self.tiered('copies')
+        cache.set('key', ['value'])
+        cache.get('key').append('changed')
+        self.assertEqual(cache.get('key'), ['value'])
+
+
+class SQLiteBackendTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        connections.databases['pragmas'] = {
+            'ENGINE': 'core.db_backends.sqlite3',
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+            'OPTIONS': {'pragmas': {'cache_size': -1024}},
+        }
+        self.addCleanup(connections.databases.pop, 'pragmas')
+        self.addCleanup(lambda: connections['pragmas'].close())
+
+    def pragma(self, name):
+        with connections['pragmas'].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self):
+        """Соединение открывается в WAL с PRAGMA из настроек."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -1024)
+        self.assertGreater(self.pragma('mmap_size'), 0)
+
+
+@override_settings(WRITE_QUEUE=True, WRITE_RETRY_DELAY=0)
+class WriteQueueTests(TransactionTestCase):
+    def setUp(self):
+        writes.write_stats.clear()
+        self.results = {}
+
+    def submit(self, name, func, *args, **kwargs):
+        def run():
+            try:
+                self.results[name] = writes.submit(func, *args, **kwargs)
+            except Exception as error:
+                self.results[name] = error
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_runs_inline_inside_transaction(self):
+        """В открытой транзакции запись идёт в ней же, без очереди."""
+        with transaction.atomic():
+            name = writes.submit(lambda: threading.current_thread().name)
+        self.assertEqual(name, threading.current_thread().name)
+
+    def test_queued_jobs_share_transaction(self):
+        """Задачи, ждавшие занятого писателя, выполняются одной пачкой."""
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        def fail():
+            raise ValueError('ошибка задачи')
+
+        threads = [self.submit('block', block)]
+        started.wait(5)
+        threads += [
+            self.submit(f'user{i}', User.objects.create, username=f'user{i}')
+            for i in range(5)
+        ]
+        threads.append(self.submit('fail', fail))
+        while writes._queue.qsize() < 6:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(writes.write_stats['batches'], 2)
+        self.assertEqual(writes.write_stats['jobs'], 7)
+        self.assertGreater(writes.write_stats['wait_seconds'], 0)
+        self.assertIsInstance(self.results['fail'], ValueError)
+        # Ошибка одной задачи не откатывает соседей по пачке
+        self.assertEqual(
+            User.objects.filter(username__startswith='user').count(), 5
+        )
+        self.assertEqual(self.results['user0'].username, 'user0')
+
+    def test_locked_batch_is_retried(self):
+        """При "database is locked" пачка откатывается и повторяется."""
+        calls = []
+
+        def create():
+            calls.append(1)
+            user = User.objects.create(username=f'try{len(calls)}')
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return user
+
+        self.submit('create', create).join(5)
+        self.assertEqual(self.results['create'].username, 'try2')
+        self.assertEqual(writes.write_stats['retries'], 1)
+        self.assertFalse(User.objects.filter(username='try1').exists())
+
+    @override_settings(WRITE_RETRIES=2)
+    def test_retries_are_limited(self):
+        """После WRITE_RETRIES повторов ошибка доходит до запроса."""
+        def locked():
+            raise OperationalError('database is locked')
+
+        self.submit('locked', locked).join(5)
+        self.assertIsInstance(self.results['locked'], OperationalError)
+        self.assertEqual(writes.write_stats['retries'], 2)
+        self.assertEqual(writes.write_stats['failures'], 1)
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'user{i}') for i in range(4)
+        ]
+
+    def view(self, request):
+        # Запрос на каждую строку вместо одного на все
+        for user in self.users:
+            User.objects.filter(pk=user.pk).first()
+        return HttpResponse()
+
+    def run_view(self, budget):
+        request = RequestFactory().get('/page/')
+        request.resolver_match = ResolverMatch(
+            query_budget(budget)(lambda request: None), (), {}
+        )
+        return QueryLogMiddleware(
+            QueryBudgetMiddleware(self.view)
+        )(request)
+
+    def test_shape_ignores_values(self):
+        """Форма запроса не зависит от параметров и длины списка IN."""
+        self.assertEqual(
+            shape("SELECT a FROM t WHERE id IN (%s, %s) AND b = 'x' LIMIT 21"),
+            shape('SELECT a FROM t WHERE id IN (%s) AND b = %s LIMIT 1'),
+        )
+
+    @override_settings(
+        QUERY_INSPECTOR='warn', QUERY_REPEAT_THRESHOLD=10,
+        SERVER_TIMING_SAMPLE=1,
+    )
+    def test_one_query_wrapper_per_request(self):
+        """Метрики, Server-Timing и бюджет читают один общий QueryLog."""
+        wrappers = []
+
+        def view(request):
+            wrappers.append(len(connection.execute_wrappers))
+            return self.view(request)
+
+        request = RequestFactory().get('/page/')
+        request.resolver_match = None
+        chain = QueryLogMiddleware(MetricsMiddleware(
+            ServerTimingMiddleware(QueryBudgetMiddleware(view))
+        ))
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            response = chain(request)
+        self.assertEqual(wrappers, [1])
+        self.assertEqual(len(request.query_log), len(self.users))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn(f'sql_count={len(self.users)}', logs.output[0])
+
+    @override_settings(QUERY_INSPECTOR='raise', QUERY_REPEAT_THRESHOLD=3)
+    def test_repeated_query_raises(self):
+        """Повтор одного SELECT на каждую строку считается ошибкой."""
+        with self.assertRaisesMessage(QueryBudgetError, '4 раз'):
+            self.run_view(budget=10)
+
+    @override_settings(QUERY_INSPECTOR='warn', QUERY_REPEAT_THRESHOLD=10)
+    def test_over_budget_is_logged(self):
+        """В режиме warn превышение бюджета попадает в лог."""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.assertEqual(self.run_view(budget=2).status_code, 200)
+        self.assertIn('4 запросов при бюджете 2', logs.output[0])
+
+
+@override_settings(SERVER_TIMING_SAMPLE=1)
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self):
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        return response, logs.records[0].timing
+
+    def test_header_and_log_line(self):
+        """Фазы запроса уходят в Server-Timing и строку лога."""
+        response, fields = self.get()
+        header = response['Server-Timing']
+        for phase in ('sql;dur=', 'template;dur=', 'cache;dur=', 'total'):
+            self.assertIn(phase, header)
+        self.assertEqual(fields['view'], 'posts:index')
+        self.assertEqual(fields['status'], 200)
+        self.assertGreater(fields['sql_count'], 0)
+        self.assertEqual(fields['page_misses'], 1)
+        self.assertGreater(fields['cache_misses'], 0)
+
+    def test_cached_page(self):
+        """Страница из кеша не рисует шаблон и не ходит в базу за постами."""
+        first = self.get()[1]
+        fields = self.get()[1]
+        self.assertEqual(fields['page_hits'], 1)
+        self.assertNotIn('template_ms', fields)
+        self.assertLess(fields['sql_count'], first['sql_count'])
+
+    @override_settings(SERVER_TIMING_SAMPLE=0)
+    def test_not_sampled(self):
+        """Запрос вне выборки не замеряется."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings = override_settings(
+            METRICS_PATH=os.path.join(directory, 'metrics.sqlite3')
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics.reset()
+        cache.clear()
+        self.client = Client()
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode().splitlines()
+
+    def test_view_histograms_and_counters(self):
+        """Гистограммы и счётчики по представлениям, доля попаданий."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        lines = self.scrape()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', lines)
+        self.assertIn(
+            'http_request_duration_seconds_bucket'
+            '{le="+Inf",view="posts:index"} 2', lines
+        )
+        self.assertIn(
+            'http_responses_total{status="200",view="posts:index"} 2', lines
+        )
+        self.assertIn('db_queries_per_request_count{view="posts:index"} 2',
+                      lines)
+        self.assertIn('cache_hit_ratio{cache="page"} 0.5000', lines)
+        buckets = [
+            line for line in lines if line.startswith(
+                'http_request_duration_seconds_bucket{'
+            ) and 'posts:index' in line
+        ]
+        self.assertEqual(len(buckets), len(metrics.LATENCY_BUCKETS) + 1)
+        self.assertTrue(buckets[-1].startswith(
+            'http_request_duration_seconds_bucket{le="+Inf"'
+        ))
+
+    def test_processes_are_summed(self):
+        """Счётчики другого процесса складываются с текущим."""
+        labels = {'kind': 'thumbnail', 'result': 'ok'}
+        pid = os.fork()
+        if pid == 0:
+            metrics.inc('thumbnails_generated_total', labels, 2)
+            metrics.flush(force=True)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        metrics.inc('thumbnails_generated_total', labels)
+        self.assertIn(
+            'thumbnails_generated_total{kind="thumbnail",result="ok"} 3',
+            self.scrape()
+        )
+
+    @override_settings(DEBUG=False)
+    def test_only_internal_ips(self):
+        """Вне INTERNAL_IPS метрики не отдаются."""
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TemplateProfileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        for i in range(3):
+            Post.objects.create(author=author, text=f'Пост {i}')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        template_profile._aggregate = None
+        # Иначе flush() при выходе запишет сумму в TEMPLATE_PROFILE_DIR
+        self.addCleanup(setattr, template_profile, '_aggregate', None)
+        cache.clear()
+
+    def profile_index(self, mode, requests=1):
+        with override_settings(
+            TEMPLATE_PROFILE=mode, TEMPLATE_PROFILE_DIR=self.directory
+        ):
+            client = Client()
+            for _ in range(requests):
+                cache.clear()
+                client.get(reverse('posts:index'))
+        files = sorted(os.listdir(self.directory))
+        contents = {}
+        for name in files:
+            with open(os.path.join(self.directory, name)) as file_:
+                contents[name] = file_.read()
+        return contents
+
+    def calls(self, summary, template):
+        for line in summary.splitlines():
+            if line.startswith(template + ' '):
+                return int(line.split()[1])
+        return 0
+
+    def test_request_profile(self):
+        """Стеки include под страницей и число вызовов каждого шаблона."""
+        contents = self.profile_index(template_profile.REQUEST_MODE)
+        self.assertEqual(len(contents), 2)
+        folded = next(c for n, c in contents.items() if n.endswith('.folded'))
+        summary = next(c for n, c in contents.items() if n.endswith('.txt'))
+        self.assertIn(
+            'posts:index;posts/index.html;base.html;'
+            'posts/includes/post_generator.html ', folded
+        )
+        for line in folded.splitlines():
+            self.assertRegex(line, r'^posts:index;\S+ \d+$')
+        self.assertEqual(
+            self.calls(summary, 'posts/includes/post_generator.html'), 3
+        )
+        self.assertEqual(self.calls(summary, 'includes/header.html'), 1)
+
+    @override_settings(TEMPLATE_PROFILE_FLUSH_INTERVAL=60)
+    def test_aggregate_profile(self):
+        """В режиме aggregate сумма копится в памяти и пишется flush()."""
+        contents = self.profile_index(
+            template_profile.AGGREGATE_MODE, requests=2
+        )
+        self.assertEqual(contents, {})
+        with override_settings(TEMPLATE_PROFILE_DIR=self.directory):
+            template_profile.flush()
+        contents = self.profile_index(None)
+        self.assertEqual(
+            sorted(contents), [
+                f'aggregate-{os.getpid()}.folded',
+                f'aggregate-{os.getpid()}.txt',
+            ]
+        )
+        summary = contents[f'aggregate-{os.getpid()}.txt']
+        self.assertEqual(
+            self.calls(summary, 'posts/includes/post_generator.html'), 6
+        )
+
+    def test_disabled_by_default(self):
+        """Без TEMPLATE_PROFILE профиль не пишется."""
+        self.assertEqual(self.profile_index(None), {})
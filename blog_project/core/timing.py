@@ -0,0 +1,76 @@
+"""Время запроса по фазам: SQL, шаблоны, кеш, миниатюры.
+
+ServerTimingMiddleware открывает Breakdown на время запроса, а код
+фаз отмечается в нём через measure() и count(). Без открытого
+Breakdown (запрос не попал в выборку, фоновый поток, команда) отметки
+ничего не делают. Фазы вложены друг в друга: SQL и кеш, сделанные из
+шаблона, входят и во время шаблона.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class Breakdown:
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = Counter()
+
+    def add(self, phase, seconds):
+        self.durations[phase] += seconds
+
+    def header(self, total):
+        """Значение заголовка Server-Timing, длительности в мс."""
+        metrics = [
+            f'{phase};dur={seconds * 1000:.1f}'
+            for phase, seconds in self.durations.items()
+        ]
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def fields(self):
+        """Поля строки лога: phase_ms и счётчики."""
+        fields = {
+            f'{phase}_ms': round(seconds * 1000, 1)
+            for phase, seconds in self.durations.items()
+        }
+        fields.update(self.counts)
+        return fields
+
+
+def current():
+    return getattr(_local, 'breakdown', None)
+
+
+def start():
+    _local.breakdown = Breakdown()
+    return _local.breakdown
+
+
+def stop():
+    _local.breakdown = None
+
+
+@contextmanager
+def measure(phase):
+    breakdown = current()
+    if breakdown is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        breakdown.add(phase, time.perf_counter() - started)
+
+
+def count(name, value=1):
+    breakdown = current()
+    if breakdown is not None:
+        breakdown.counts[name] += value
@@ -1,9 +1,30 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics as metrics_store
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
 
 
+def permission_denied(request, exception):
+    return render(request, 'core/403.html', status=403)
+
+
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики всех процессов для Prometheus, только с INTERNAL_IPS."""
+    if (
+        not settings.DEBUG
+        and request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS
+    ):
+        raise Http404
+    return HttpResponse(
+        metrics_store.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,173 @@
+"""Очередь записей в SQLite внутри процесса.
+
+SQLite пускает в базу одного писателя за раз. Запросы процесса отдают
+свои записи одному потоку-писателю, и потоки процесса не спорят за
+блокировку файла. Задачи, которые накопились, пока писатель был занят,
+выполняются одной транзакцией BEGIN IMMEDIATE, каждая в своей точке
+сохранения. Если базу держит другой процесс ("database is locked"),
+пачка откатывается и повторяется с экспоненциальной задержкой.
+"""
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+# Счётчики процесса: jobs, batches, retries, failures, wait_seconds
+write_stats = Counter()
+
+_queue = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _stat(name, value=1):
+    write_stats[name] += value
+    metrics.inc(f'write_queue_{name}_total', value=value)
+
+
+def is_locked(error):
+    return any(message in str(error) for message in LOCKED_MESSAGES)
+
+
+class Job:
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.queued = time.monotonic()
+
+    def __call__(self):
+        return self.func(*self.args, **self.kwargs)
+
+
+def _attempts():
+    """Номера попыток с паузами между ними: 0, 1, ... WRITE_RETRIES."""
+    delay = settings.WRITE_RETRY_DELAY
+    for attempt in range(settings.WRITE_RETRIES + 1):
+        if attempt:
+            _stat('retries')
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay *= 2
+        yield attempt
+
+
+def _run_jobs(batch):
+    """(задача, результат, ошибка) для каждой задачи пачки.
+
+    Ошибка задачи откатывает только её точку сохранения, блокировка
+    базы прерывает всю пачку.
+    """
+    results = []
+    for job in batch:
+        try:
+            with transaction.atomic():
+                results.append((job, job(), None))
+        except OperationalError as error:
+            if is_locked(error):
+                raise
+            results.append((job, None, error))
+        except Exception as error:
+            results.append((job, None, error))
+    return results
+
+
+def _run_batch(batch):
+    """Выполняет пачку одной транзакцией и раздаёт результаты задачам."""
+    for attempt in _attempts():
+        try:
+            connection.close_if_unusable_or_obsolete()
+            with transaction.atomic():
+                results = _run_jobs(batch)
+        except OperationalError as error:
+            if is_locked(error) and attempt < settings.WRITE_RETRIES:
+                continue
+            results = [(job, None, error) for job in batch]
+        except Exception as error:
+            results = [(job, None, error) for job in batch]
+        break
+    _stat('batches')
+    for job, result, error in results:
+        if error is None:
+            job.future.set_result(result)
+        else:
+            _stat('failures')
+            job.future.set_exception(error)
+
+
+def _writer(jobs):
+    connection.begin_immediate = True
+    while True:
+        batch = [jobs.get()]
+        while len(batch) < settings.WRITE_BATCH_SIZE:
+            try:
+                batch.append(jobs.get_nowait())
+            except queue.Empty:
+                break
+        started = time.monotonic()
+        for job in batch:
+            _stat('wait_seconds', started - job.queued)
+        try:
+            _run_batch(batch)
+        except Exception:
+            logger.exception('Поток записи не выполнил пачку')
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(
+                        OperationalError('Поток записи не выполнил задачу')
+                    )
+
+
+def _get_queue():
+    global _queue, _pid
+    with _lock:
+        # После fork поток-писатель остался в родителе
+        if _queue is None or _pid != os.getpid():
+            _queue = queue.Queue()
+            _pid = os.getpid()
+            threading.Thread(
+                target=_writer, args=(_queue,), name='writes', daemon=True
+            ).start()
+    return _queue
+
+
+def _run_here(job):
+    if connection.in_atomic_block:
+        # Внешнюю транзакцию нельзя ни передать писателю, ни повторить
+        return job()
+    for attempt in _attempts():
+        try:
+            with transaction.atomic():
+                return job()
+        except OperationalError as error:
+            if not is_locked(error) or attempt == settings.WRITE_RETRIES:
+                raise
+
+
+def submit(func, *args, **kwargs):
+    """Выполняет func(*args, **kwargs) в транзакции потока-писателя.
+
+    Возвращает результат func или поднимает её исключение. func может
+    выполниться несколько раз, поэтому создаёт объекты сама, а не
+    сохраняет готовые. Внутри открытой транзакции и при
+    WRITE_QUEUE = False вызов идёт в текущем потоке.
+    """
+    _stat('jobs')
+    job = Job(func, args, kwargs)
+    if not settings.WRITE_QUEUE or connection.in_atomic_block:
+        return _run_here(job)
+    _get_queue().put(job)
+    return job.future.result(settings.WRITE_TIMEOUT)
@@ -5,7 +5,11 @@ import sys
 
 
 def main():
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_project.settings')
+    settings_module = 'blog_project.settings'
+    if sys.argv[1:2] == ['test']:
+        # Кеш, метрики и загрузки тестов - во временном каталоге
+        settings_module = 'blog_project.test_settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
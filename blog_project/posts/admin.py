@@ -1,15 +1,216 @@
+import datetime
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.core.paginator import Paginator
+from django.db import connection, models
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.text import Truncator
+
+from . import search
+from .models import Comment, Group, Post
+
+
+def estimate_rows(model):
+    """Примерное число строк таблицы без COUNT(*) по всей таблице.
+
+    Берётся из sqlite_stat1 (после ANALYZE), иначе - наибольший id.
+    """
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone():
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table]
+                )
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    return model._default_manager.aggregate(
+        last=models.Max('pk')
+    )['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор списка в админке, который не считает всю таблицу.
+
+    Для списка без фильтров число строк оценивается, отфильтрованный
+    список (поиск, дата) считается как обычно - по индексу.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        return estimate_rows(queryset.model)
+
+
+def next_period(day, kind):
+    if kind == 'year':
+        return day.replace(year=day.year + 1, month=1, day=1)
+    if kind == 'month':
+        if day.month == 12:
+            return day.replace(year=day.year + 1, month=1, day=1)
+        return day.replace(month=day.month + 1, day=1)
+    return day + datetime.timedelta(days=1)
+
+
+class IndexedQuerySet(models.QuerySet):
+    """QuerySet для списков в админке, которому хватает индекса по дате.
+
+    Навигация по датам (date_hierarchy) спрашивает границы через
+    Min/Max и список периодов через dates(). SQLite находит по индексу
+    только одиночный MIN или MAX, а dates() считает по всей таблице, поэтому
+    здесь оба вопроса сводятся к поискам по индексу: по одному на границу
+    и на каждый непустой период.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        if args or not kwargs or not all(
+            isinstance(aggregate, (models.Min, models.Max))
+            and aggregate.filter is None
+            and len(aggregate.source_expressions) == 1
+            and isinstance(aggregate.source_expressions[0], models.F)
+            for aggregate in kwargs.values()
+        ):
+            return super().aggregate(*args, **kwargs)
+        result = {}
+        for alias, aggregate in kwargs.items():
+            field = aggregate.source_expressions[0].name
+            order = field if isinstance(aggregate, models.Min) else '-' + field
+            result[alias] = self.order_by(order).values_list(
+                field, flat=True
+            ).first()
+        return result
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind not in ('year', 'month', 'day'):
+            return super().dates(field_name, kind, order)
+        periods = []
+        queryset = self.order_by(field_name).values_list(
+            field_name, flat=True
+        )
+        start = None
+        while True:
+            value = (
+                queryset.filter(**{f'{field_name}__gte': start}) if start
+                else queryset
+            ).first()
+            if value is None:
+                break
+            if isinstance(value, datetime.datetime):
+                if timezone.is_aware(value):
+                    value = timezone.localtime(value)
+                value = value.date()
+            if kind == 'year':
+                value = value.replace(month=1, day=1)
+            elif kind == 'month':
+                value = value.replace(day=1)
+            periods.append(value)
+            start = next_period(value, kind)
+            if isinstance(
+                self.model._meta.get_field(field_name), models.DateTimeField
+            ):
+                start = datetime.datetime.combine(start, datetime.time())
+                if settings.USE_TZ:
+                    start = timezone.make_aware(start)
+        return periods if order == 'ASC' else periods[::-1]
+
 
-from .models import Group, Post
+class IndexedAdmin(admin.ModelAdmin):
+    """Список, которому не нужны полный COUNT(*) и проход по таблице."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedQuerySet(
+            queryset.model, queryset.query, using=queryset._db
+        )
 
-class PostAdmin(admin.ModelAdmin):
+
+class PreloadedRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле id связанного объекта, подпись которого уже загружена.
+
+    В списке постов группа приходит через select_related, и подпись
+    берётся из неё, а не отдельным запросом на каждую строку.
+    """
+    related_object = None
+
+    def label_and_url_for_value(self, value):
+        obj = self.related_object
+        if obj is None or str(obj.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        try:
+            url = reverse(
+                '%s:%s_%s_change' % (
+                    self.admin_site.name,
+                    obj._meta.app_label,
+                    obj._meta.model_name,
+                ),
+                args=(obj.pk,)
+            )
+        except NoReverseMatch:
+            url = ''
+        return Truncator(obj).words(14), url
+
+
+class PostAdmin(IndexedAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    empty_value_display = '-пусто-'
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = PreloadedRawIdWidget(
+                db_field.remote_field, self.admin_site
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        base = super().get_changelist_form(request, **kwargs)
+
+        class ChangeListForm(base):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.fields['group'].widget.related_object = (
+                    self.instance.group
+                )
+
+        return ChangeListForm
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE по всей таблице
+        return search.filter_posts(queryset, search_term), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug',)
+    search_fields = ('title', 'slug',)
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class CommentAdmin(IndexedAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'post',)
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('author', 'post')
+    list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
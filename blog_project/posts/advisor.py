@@ -0,0 +1,126 @@
+"""Проверка планов запросов страниц блога через EXPLAIN QUERY PLAN.
+
+Каждая страница запрашивается тестовым клиентом без кеша, её запросы
+перехватываются и объясняются в SQLite. Плохими считаются полный проход
+по таблице (SCAN без индекса) и сортировка во временном B-дереве.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from . import feeds
+from .models import Group, Post
+from .pagination import CURSOR_MODE
+
+User = get_user_model()
+
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def explain(sql):
+    """Строки плана запроса: (id, parent, detail)."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [(row[0], row[1], row[-1]) for row in cursor.fetchall()]
+
+
+def problems(plan):
+    """Шаги плана, которые читают всю таблицу или сортируют на лету."""
+    found = []
+    for _, _, detail in plan:
+        if detail.startswith('SCAN ') and not (
+            ' USING ' in detail or 'VIRTUAL TABLE' in detail
+            or detail.startswith('SCAN CONSTANT ROW')
+        ):
+            found.append(detail)
+        elif detail.startswith('USE TEMP B-TREE'):
+            found.append(detail)
+    return found
+
+
+def pages():
+    """(название, путь, пользователь, настройки) для страниц блога.
+
+    Аргументы адресов берутся из базы: самые тяжёлые пост, группа и
+    лента подписок. Страницы, для которых в базе нет данных,
+    пропускаются.
+    """
+    post = Post.objects.order_by('-comment_count', '-pk').first()
+    group = Group.objects.annotate(
+        size=Count('posts')
+    ).order_by('-size', 'pk').first()
+    reader = User.objects.filter(
+        stats__following_count__gt=0
+    ).order_by('-stats__following_count', 'pk').first() or (
+        User.objects.order_by('pk').first()
+    )
+    yield 'index', reverse('posts:index'), None, {}
+    yield 'index, page 2', reverse('posts:index') + '?page=2', None, {}
+    yield 'index, cursor', reverse('posts:index'), None, {
+        'POSTS_PAGINATION': CURSOR_MODE
+    }
+    if group:
+        yield 'group_posts', reverse(
+            'posts:group_posts', kwargs={'slug': group.slug}
+        ), None, {}
+    if post:
+        if post.author:
+            yield 'profile', reverse(
+                'posts:profile', kwargs={'username': post.author.username}
+            ), None, {}
+        yield 'post_detail', reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}
+        ), None, {}
+        words = post.text.split()
+        if words:
+            path = reverse('posts:search') + '?' + urlencode({'q': words[0]})
+            yield 'search', path, None, {}
+    if reader:
+        yield 'post_create', reverse('posts:post_create'), reader, {}
+        for engine in (feeds.PUSH_ENGINE, feeds.PULL_ENGINE):
+            yield f'follow_index, {engine}', reverse(
+                'posts:follow_index'
+            ), reader, {'FOLLOW_FEED_ENGINE': engine}
+            yield f'follow_index, {engine}, cursor', reverse(
+                'posts:follow_index'
+            ), reader, {
+                'FOLLOW_FEED_ENGINE': engine,
+                'POSTS_PAGINATION': CURSOR_MODE,
+            }
+
+
+def analyze():
+    """Запросы каждой страницы с их проблемами в плане.
+
+    Возвращает список (страница, sql, проблемы). Всё, что страницы
+    записали в базу, откатывается.
+    """
+    report = []
+    with override_settings(
+        CACHES=NO_CACHE,
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+    ), transaction.atomic():
+        for name, path, user, overrides in list(pages()):
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            with override_settings(**overrides), CaptureQueriesContext(
+                connection
+            ) as queries:
+                client.get(path)
+            seen = set()
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or sql in seen:
+                    continue
+                seen.add(sql)
+                report.append((name, sql, problems(explain(sql))))
+        transaction.set_rollback(True)
+    return report
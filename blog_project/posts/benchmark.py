@@ -0,0 +1,338 @@
+"""Синтетические данные и замер времени всех страниц блога.
+
+seed() наполняет базу пачками bulk_create: пользователи, группы, посты,
+комментарии и граф подписок со степенным распределением - немногие
+авторы собирают большую часть подписчиков, постов и комментариев, как
+на живом сайте. Сигналы bulk_create не вызывает, поэтому после вставки
+счётчики, ленты подписок и поисковый индекс пересобираются целиком.
+
+run() запрашивает страницы из advisor.pages() тестовым клиентом и
+возвращает перцентили времени ответа и число SQL-запросов; результат
+сохраняется в JSON, чтобы сравнивать прогоны между собой.
+"""
+import itertools
+import json
+import math
+import platform
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from faker import Faker
+
+from core.queries import QueryLog
+
+from . import advisor, counters, feeds, search
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SEED_BATCH = 5000
+USERNAME = 'bench_{}'
+PERCENTILES = (50, 95, 99)
+# Показатель степенного закона: вес i-го по популярности 1 / i ** ZIPF
+ZIPF = 1.0
+# Доля постов без группы
+NO_GROUP = 0.3
+
+
+def _weights(size):
+    """Накопленные веса закона Ципфа для random.choices."""
+    return list(itertools.accumulate(
+        1 / rank ** ZIPF for rank in range(1, size + 1)
+    ))
+
+
+@contextmanager
+def _explicit_dates(*models):
+    """Даёт bulk_create записать pub_date, а не текущее время."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _batches(objects):
+    while True:
+        batch = list(itertools.islice(objects, SEED_BATCH))
+        if not batch:
+            return
+        yield batch
+
+
+def _new_pks(model, after):
+    return list(model.objects.filter(pk__gt=after).order_by(
+        'pk'
+    ).values_list('pk', flat=True))
+
+
+def _last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+class Seeder:
+    def __init__(self, seed=None, days=365):
+        self.random = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=days)
+
+    def users(self, total):
+        last = _last_pk(User)
+        # Номер в имени - от уже созданных, повторный запуск не упадёт
+        offset = User.objects.filter(
+            username__startswith=USERNAME.format('')
+        ).count()
+        password = make_password(None)
+        for batch in _batches(
+            User(
+                username=USERNAME.format(offset + number),
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                email=self.fake.email(),
+                password=password,
+            )
+            for number in range(total)
+        ):
+            User.objects.bulk_create(batch)
+        return _new_pks(User, last)
+
+    def groups(self, total):
+        last = _last_pk(Group)
+        offset = Group.objects.filter(slug__startswith='bench-').count()
+        Group.objects.bulk_create(
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'bench-{offset + number}',
+                description=self.fake.paragraph(),
+            )
+            for number in range(total)
+        )
+        return _new_pks(Group, last)
+
+    def _date(self, share):
+        return self.start + (self.now - self.start) * share
+
+    def posts(self, total, authors, groups):
+        """Посты по возрастанию даты; плодовитые авторы - по Ципфу."""
+        last = _last_pk(Post)
+        weights = _weights(len(authors))
+        # Порядок популярности не совпадает с порядком регистрации
+        authors = self.random.sample(authors, len(authors))
+        for batch in _batches(
+            Post(
+                author_id=self.random.choices(authors, cum_weights=weights)[0],
+                group_id=(
+                    self.random.choice(groups)
+                    if groups and self.random.random() >= NO_GROUP else None
+                ),
+                text=self.fake.paragraph(nb_sentences=3),
+                pub_date=self._date(number / total),
+            )
+            for number in range(total)
+        ):
+            with _explicit_dates(Post):
+                Post.objects.bulk_create(batch)
+        return _new_pks(Post, last)
+
+    def comments(self, total, posts, authors):
+        """Комментарии собираются на немногих популярных постах."""
+        order = self.random.sample(range(len(posts)), len(posts))
+        indexes = self.random.choices(
+            order, cum_weights=_weights(len(posts)), k=total
+        )
+        for batch in _batches(
+            self._comment(index, posts, authors) for index in indexes
+        ):
+            with _explicit_dates(Comment):
+                Comment.objects.bulk_create(batch)
+
+    def _comment(self, index, posts, authors):
+        # Посты создавались равномерно по времени: дата - по номеру
+        posted = index / len(posts)
+        return Comment(
+            post_id=posts[index],
+            author_id=self.random.choice(authors),
+            text=self.fake.sentence(nb_words=12),
+            pub_date=self._date(
+                posted + (1 - posted) * self.random.random()
+            ),
+        )
+
+    def follows(self, users, average):
+        """Граф подписок: у кого подписчиков много, выбирают по Ципфу.
+
+        Число подписок пользователя распределено по Парето со средним
+        average, так что бывают и читатели с тысячами подписок.
+        """
+        if len(users) < 2 or average <= 0:
+            return 0
+        weights = _weights(len(users))
+        authors = self.random.sample(users, len(users))
+        before = Follow.objects.count()
+        for batch in _batches(self._follows(users, authors, weights, average)):
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+        return Follow.objects.count() - before
+
+    def _follows(self, users, authors, weights, average):
+        for user in users:
+            # paretovariate(2) в среднем равно 2
+            wanted = min(
+                len(users) - 1,
+                max(1, round(average * self.random.paretovariate(2) / 2)),
+            )
+            chosen = set(self.random.choices(
+                authors, cum_weights=weights, k=wanted
+            ))
+            chosen.discard(user)
+            for author in chosen:
+                yield Follow(user_id=user, author_id=author)
+
+
+def seed(users=1000, groups=20, posts=10000, comments=20000, follows=20,
+         seed=None, days=365, log=None):
+    """Наполняет базу синтетическими данными. Возвращает число строк.
+
+    follows - среднее число подписок пользователя. log(сообщение)
+    вызывается перед каждым этапом.
+    """
+    log = log or (lambda message: None)
+    seeder = Seeder(seed, days)
+    created = {}
+    with transaction.atomic():
+        log(f'Пользователи: {users}')
+        user_pks = seeder.users(users)
+        created['users'] = len(user_pks)
+        log(f'Группы: {groups}')
+        group_pks = seeder.groups(groups)
+        created['groups'] = len(group_pks)
+        if user_pks:
+            log(f'Посты: {posts}')
+            post_pks = seeder.posts(posts, user_pks, group_pks)
+            created['posts'] = len(post_pks)
+            if post_pks:
+                log(f'Комментарии: {comments}')
+                seeder.comments(comments, post_pks, user_pks)
+                created['comments'] = comments
+            log('Подписки')
+            created['follows'] = seeder.follows(user_pks, follows)
+        log('Счётчики, ленты подписок и поисковый индекс')
+        counters.recount()
+        created['feed_entries'] = feeds.rebuild()
+        search.reindex()
+    if connection.vendor == 'sqlite':
+        # Статистика для планировщика и оценок числа строк в админке
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return created
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def _measure(path, user, overrides, iterations, warm):
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    timings = []
+    queries = []
+    with override_settings(**overrides):
+        if warm:
+            client.get(path)
+        for _ in range(iterations):
+            with QueryLog() as log:
+                started = time.perf_counter()
+                response = client.get(path)
+                timings.append(time.perf_counter() - started)
+            queries.append(len(log))
+    result = {'status': response.status_code}
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(
+            percentile(timings, percent) * 1000, 3
+        )
+    result['mean_ms'] = round(sum(timings) / len(timings) * 1000, 3)
+    result['queries'] = max(queries)
+    return result
+
+
+def dataset():
+    """Размеры таблиц, на которых сделан замер."""
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def run(iterations=20, warm=False, only=None):
+    """Замер страниц advisor.pages(). Возвращает отчёт для JSON.
+
+    warm=False - кеш выключен, каждая страница строится из базы; при
+    warm=True работает кеш из настроек и до замера страница
+    запрашивается один раз. only - названия страниц для замера.
+    """
+    caches = {} if warm else {'CACHES': advisor.NO_CACHE}
+    results = {}
+    with override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **caches
+    ), transaction.atomic():
+        for name, path, user, overrides in list(advisor.pages()):
+            if only and name not in only:
+                continue
+            results[name] = {
+                'path': path,
+                **_measure(path, user, overrides, iterations, warm),
+            }
+        transaction.set_rollback(True)
+    return {
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'iterations': iterations,
+        'cache': 'warm' if warm else 'cold',
+        'dataset': dataset(),
+        'results': results,
+    }
+
+
+def save(report, path):
+    with open(path, 'w') as file_:
+        json.dump(report, file_, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path) as file_:
+        return json.load(file_)
+
+
+def compare(report, baseline, metric='p95_ms'):
+    """(страница, было, стало, изменение в %) для общих страниц."""
+    rows = []
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        old, new = before[metric], result[metric]
+        change = (new - old) / old * 100 if old else 0.0
+        rows.append((name, old, new, round(change, 1)))
+    return rows
@@ -0,0 +1,193 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from core.cache import cached_response
+
+from .models import Group, Post
+
+User = get_user_model()
+VERSION_KEY = 'feed:version:{}'
+ALL_POSTS = 'all'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scopes(author_id, *group_ids):
+    """Области ленты, в которых показывается пост автора из групп."""
+    scopes = [ALL_POSTS]
+    scopes.extend(
+        author_scope(username) for username in
+        User.objects.filter(pk=author_id).values_list('username', flat=True)
+    )
+    scopes.extend(
+        group_scope(slug) for slug in Group.objects.filter(
+            pk__in=[pk for pk in group_ids if pk]
+        ).values_list('slug', flat=True)
+    )
+    return scopes
+
+
+def _new_version():
+    # Версия - время изменения в наносекундах: вытесненный из кеша ключ
+    # версии не вернёт старые фрагменты, а по версии строится Last-Modified.
+    return time.time_ns()
+
+
+def scope_versions(*scopes):
+    """Версии областей ленты в порядке scopes."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    for key, version in missing.items():
+        if not cache.add(key, version, None):
+            missing[key] = cache.get(key, version)
+    versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def feed_versions(*scopes):
+    """Склеивает версии областей ленты в одну строку для ключа кеша."""
+    return '.'.join(str(version) for version in scope_versions(*scopes))
+
+
+def bump_feed_version(*scopes):
+    """Сдвигает версии областей, делая их фрагменты недостижимыми."""
+    cache.set_many(
+        {VERSION_KEY.format(scope): _new_version() for scope in scopes}, None
+    )
+
+
+def fragment_context(*scopes):
+    """Контекст для {% cache %} вокруг списка карточек постов."""
+    return {
+        'fragment_timeout': settings.FEED_FRAGMENT_TIMEOUT,
+        'fragment_version': feed_versions(*scopes),
+    }
+
+
+def _scope_names(scopes, kwargs):
+    return [scope(**kwargs) if callable(scope) else scope for scope in scopes]
+
+
+def _shared_page(request):
+    """Страница одна для всех: посетитель не вошёл на сайт.
+
+    Без куки сессии посетитель заведомо аноним, и request.user из базы
+    не читается.
+    """
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+def cache_feed_page(timeout, *scopes):
+    """Кеш страницы ленты, сверяющий версии её областей.
+
+    Область задаётся строкой или функцией от именованных аргументов
+    представления, например group_scope для group_posts(slug).
+    Страница свежая timeout секунд или до первого изменения её областей;
+    после этого одну страницу пересчитывает один процесс, а остальные
+    пока отдают прошлую версию. Кешируются только страницы для
+    анонимов: в шапке и кнопках подписки вошедшего - его данные, и ему
+    страница собирается заново из кеша фрагментов.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _shared_page(request):
+                return view(request, *args, **kwargs)
+            return cached_response(
+                view, request, args, kwargs,
+                timeout=timeout,
+                cache_alias=settings.CACHE_MIDDLEWARE_ALIAS,
+                key_prefix=view.__name__,
+                version=feed_versions(*_scope_names(scopes, kwargs)),
+            )
+        return wrapper
+    return decorator
+
+
+def _latest(posts):
+    return posts.order_by().aggregate(latest=Max('pub_date'))['latest']
+
+
+def index_state():
+    return _latest(Post.objects.all()), [ALL_POSTS]
+
+
+def group_state(slug):
+    return _latest(Post.objects.filter(group__slug=slug)), [group_scope(slug)]
+
+
+def profile_state(username):
+    return (
+        _latest(Post.objects.filter(author__username=username)),
+        [author_scope(username)],
+    )
+
+
+def post_state(post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'pub_date', 'author__username'
+    ).first()
+    if post is None:
+        return None
+    pub_date, username = post
+    return pub_date, [ALL_POSTS, author_scope(username)]
+
+
+def _conditional_state(request, state, kwargs):
+    if not hasattr(request, '_feed_state'):
+        request._feed_state = (None, None)
+        current = state(**kwargs)
+        if current is not None:
+            latest, scopes = current
+            versions = scope_versions(*scopes)
+            # Страница зависит от пользователя, поэтому тег включает
+            # сессию: так не нужен лишний запрос за request.user.
+            session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+            etag = hashlib.md5(
+                f'{versions}|{latest}|{session}'.encode()
+            ).hexdigest()
+            modified = datetime.fromtimestamp(
+                max(versions) / 1e9, timezone.utc
+            )
+            if latest is not None:
+                modified = max(modified, latest)
+            request._feed_state = (etag, modified)
+    return request._feed_state
+
+
+def conditional_feed(state):
+    """Условный GET для страниц лент.
+
+    state(**kwargs представления) одним индексным запросом возвращает
+    дату последнего поста и области ленты или None, если страницы нет.
+    Если ETag или Last-Modified клиента совпадают, ответ 304 отдаётся
+    до пагинации и рендеринга.
+    """
+    def etag(request, *args, **kwargs):
+        return _conditional_state(request, state, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return _conditional_state(request, state, kwargs)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,199 @@
+"""Сборка мусора в медиа: картинки без постов и их миниатюры.
+
+Обход потоковый: дерево файлов и хранилище sorl читаются пачками, и каждая
+пачка имён сверяется с Post.image и ImageVariant.image одним запросом.
+Файлы моложе min_age не трогаются: пост с только что загруженной
+картинкой может быть ещё не сохранён.
+"""
+import os
+import time
+
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import ImageVariant, MediaFile, Post
+from .storage import content_storage
+
+MEDIA_DIR = 'posts/'
+QUARANTINE_DIR = 'quarantine/'
+BATCH_SIZE = 500
+MIN_AGE = 60 * 60
+
+
+class Report:
+    """Итог сборки: просмотрено, найдено сирот и миниатюр, байт, секунд."""
+
+    def __init__(self):
+        self.scanned = 0
+        self.orphans = 0
+        self.thumbnails = 0
+        self.freed = 0
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        return self.scanned / self.elapsed if self.elapsed else 0.0
+
+
+def walk(storage, directory):
+    """Имена файлов каталога хранилища, по одному, без списка всего дерева."""
+    root = storage.path('')
+    pending = [storage.path(directory)]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield os.path.relpath(entry.path, root).replace('\\', '/')
+
+
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def live_names(names):
+    """Имена из names, на которые ссылаются посты или их варианты."""
+    return set(
+        Post.objects.filter(image__in=names).values_list('image', flat=True)
+    ) | set(
+        ImageVariant.objects.filter(image__in=names).values_list(
+            'image', flat=True
+        )
+    )
+
+
+class Collector:
+    """Ищет и удаляет (или переносит в карантин) осиротевшие файлы."""
+
+    def __init__(self, dry_run=False, quarantine=False,
+                 batch_size=BATCH_SIZE, min_age=MIN_AGE):
+        self.dry_run = dry_run
+        self.quarantine = quarantine
+        self.batch_size = batch_size
+        self.min_age = min_age
+        self.report = Report()
+
+    def collect(self):
+        started = time.monotonic()
+        self.collect_media()
+        self.collect_kvstore()
+        self.collect_thumbnail_files()
+        self.report.elapsed = time.monotonic() - started
+        return self.report
+
+    def _young(self, storage, name):
+        try:
+            modified = os.stat(storage.path(name)).st_mtime
+        except FileNotFoundError:
+            return True
+        return time.time() - modified < self.min_age
+
+    def _remove(self, storage, name, quarantine=False):
+        path = storage.path(name)
+        self.report.freed += os.stat(path).st_size
+        if self.dry_run:
+            return
+        if quarantine:
+            target = storage.path(QUARANTINE_DIR + name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        else:
+            storage.delete(name)
+
+    def collect_media(self):
+        """Картинки и варианты в MEDIA_DIR, на которые никто не ссылается."""
+        for names in batches(
+            walk(content_storage, MEDIA_DIR), self.batch_size
+        ):
+            self.report.scanned += len(names)
+            live = live_names(names)
+            removed = []
+            for name in names:
+                # Время проверяется после запроса: загрузка того же
+                # содержимого обновляет его (posts.storage)
+                if name in live or self._young(content_storage, name):
+                    continue
+                self.report.orphans += 1
+                self._remove(content_storage, name, self.quarantine)
+                removed.append(name)
+                if not self.dry_run:
+                    # Миниатюры не нужны и в карантине: их можно построить
+                    # заново
+                    default.kvstore.delete(ImageFile(name, content_storage))
+            if removed and not self.dry_run:
+                MediaFile.objects.filter(
+                    name__in=removed, references=0
+                ).delete()
+
+    def _kvstore_batches(self, identity):
+        prefix = add_prefix('', identity)
+        last = prefix
+        while True:
+            keys = list(KVStoreModel.objects.filter(
+                key__startswith=prefix, key__gt=last
+            ).order_by('key').values_list('key', flat=True)[:self.batch_size])
+            if not keys:
+                return
+            last = keys[-1]
+            yield [key[len(prefix):] for key in keys]
+
+    def collect_kvstore(self):
+        """Записи sorl о миниатюрах картинок, которых уже нет на диске."""
+        for keys in self._kvstore_batches('thumbnails'):
+            self.report.scanned += len(keys)
+            sources = [
+                deserialize_image_file(value)
+                for value in KVStoreModel.objects.filter(
+                    key__in=[add_prefix(key) for key in keys]
+                ).values_list('value', flat=True)
+            ]
+            live = live_names([source.name for source in sources])
+            for source in sources:
+                # Существующие файлы разбирает collect_media
+                if source.name in live or source.exists():
+                    continue
+                thumbnails = default.kvstore._get(
+                    source.key, identity='thumbnails'
+                ) or []
+                self.report.thumbnails += len(thumbnails)
+                if not self.dry_run:
+                    default.kvstore.delete(source)
+
+    def collect_thumbnail_files(self):
+        """Файлы миниатюр, о которых sorl уже ничего не помнит."""
+        storage = default.storage
+        for names in batches(
+            walk(storage, sorl_settings.THUMBNAIL_PREFIX), self.batch_size
+        ):
+            self.report.scanned += len(names)
+            keys = {
+                add_prefix(ImageFile(name, storage).key): name
+                for name in names
+            }
+            known = set(KVStoreModel.objects.filter(
+                key__in=list(keys)
+            ).values_list('key', flat=True))
+            for key, name in keys.items():
+                if key in known or self._young(storage, name):
+                    continue
+                self.report.thumbnails += 1
+                self._remove(storage, name)
+
+
+def collect(**options):
+    return Collector(**options).collect()
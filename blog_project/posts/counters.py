@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, MediaFile, Post, UserStats
+
+User = get_user_model()
+
+# поле счётчика -> (модель, поле, указывающее на пользователя)
+USER_COUNTERS = {
+    'post_count': (Post, 'author'),
+    'follower_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _bump(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    """Сдвигает счётчик пользователя одним UPDATE без чтения строки."""
+    updated = _bump(UserStats.objects.filter(user_id=user_id), field, delta)
+    if not updated and delta > 0:
+        recount_user(user_id)
+
+
+def bump_post(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), 'comment_count', delta)
+
+
+def bump_file(name, delta):
+    """Сдвигает число постов, ссылающихся на файл картинки."""
+    if not name:
+        return
+    if _bump(MediaFile.objects.filter(name=name), 'references', delta):
+        return
+    if delta > 0:
+        try:
+            with transaction.atomic():
+                MediaFile.objects.create(name=name, references=delta)
+        except IntegrityError:
+            _bump(MediaFile.objects.filter(name=name), 'references', delta)
+
+
+def recount_user(user_id):
+    UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            field: model.objects.filter(**{lookup: user_id}).count()
+            for field, (model, lookup) in USER_COUNTERS.items()
+        }
+    )
+
+
+def _count(model, lookup, outer):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{lookup: OuterRef(outer)}).order_by()
+            .values(lookup).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def recount():
+    """Пересчитывает все счётчики. Возвращает число исправленных строк."""
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=pk) for pk in
+            User.objects.filter(stats__isnull=True).values_list(
+                'pk', flat=True
+            )
+        ),
+        ignore_conflicts=True,
+    )
+    fixed = 0
+    for field, (model, lookup) in USER_COUNTERS.items():
+        actual = _count(model, lookup, 'user_id')
+        fixed += UserStats.objects.exclude(**{field: actual}).update(
+            **{field: actual}
+        )
+    actual = _count(Comment, 'post', 'pk')
+    fixed += Post.objects.exclude(comment_count=actual).update(
+        comment_count=actual
+    )
+    return fixed + recount_files()
+
+
+def recount_files():
+    """Пересчитывает ссылки постов на файлы картинок."""
+    MediaFile.objects.bulk_create(
+        (
+            MediaFile(name=name) for name in
+            Post.objects.exclude(image='').exclude(
+                image__in=MediaFile.objects.values('name')
+            ).values_list('image', flat=True).distinct()
+        ),
+        ignore_conflicts=True,
+    )
+    actual = _count(Post, 'image', 'name')
+    return MediaFile.objects.exclude(references=actual).update(
+        references=actual
+    )
@@ -0,0 +1,198 @@
+import heapq
+from collections import namedtuple
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+FEED_BATCH_SIZE = 1000
+PUSH_ENGINE = 'push'
+PULL_ENGINE = 'pull'
+TIMELINE_KEY = 'feed:timeline:{}'
+# Поля ключа курсора в запросе feed_posts()
+FEED_CURSOR = {'date_field': 'feed_date', 'pk_field': 'feed_post'}
+
+FeedKey = namedtuple('FeedKey', ('pub_date', 'pk'))
+
+
+def _entries(pairs):
+    return [
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id, post_id, pub_date in pairs
+    ]
+
+
+def is_pushed(author_id):
+    """Доставляются ли посты автора в ленты при публикации.
+
+    В движке pull раскладываются только авторы с числом подписчиков
+    меньше FEED_PUSH_THRESHOLD, остальных лента подтягивает при чтении.
+    """
+    if settings.FOLLOW_FEED_ENGINE != PULL_ENGINE:
+        return True
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'follower_count', flat=True
+    ).first()
+    return (followers or 0) < settings.FEED_PUSH_THRESHOLD
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост в ленты всех подписчиков автора."""
+    if not is_pushed(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        _entries(
+            (user_id, post.pk, post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id, depth=None):
+    """Добавляет в ленту подписчика последние посты автора."""
+    if depth is None:
+        if not is_pushed(author_id):
+            return
+        depth = settings.FEED_BACKFILL
+    recent = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:depth]
+    FeedEntry.objects.bulk_create(
+        _entries((user_id, pk, pub_date) for pk, pub_date in recent),
+        ignore_conflicts=True,
+    )
+
+
+def drop(user_id, author_id):
+    """Убирает из ленты подписчика все посты автора."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def feed_posts(user, cursor=False):
+    """Посты ленты подписок, читаемые по индексу (user, pub_date).
+
+    cursor=True выводит ключ записи ленты в аннотации FEED_CURSOR:
+    курсор фильтрует по ним в том же соединении с таблицей лент, а не в
+    новом. Для COUNT постраничного режима аннотации не нужны.
+    """
+    posts = Post.objects.select_related('author', 'group').filter(
+        feed_entries__user=user
+    )
+    if cursor:
+        return posts.annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_post=F('feed_entries__post'),
+        ).order_by('-feed_date', '-feed_post')
+    return posts.order_by(
+        F('feed_entries__pub_date').desc(), F('feed_entries__post').desc()
+    )
+
+
+def rebuild(depth=None):
+    """Пересобирает таблицу лент целиком. Возвращает число записей.
+
+    Последние посты каждого автора читаются один раз и раскладываются
+    сразу всем его подписчикам, а не отдельным запросом на подписку.
+    """
+    FeedEntry.objects.all().delete()
+    follows = Follow.objects.order_by('author_id').values_list(
+        'author_id', 'user_id'
+    )
+    for author_id, group in groupby(
+        follows.iterator(), key=itemgetter(0)
+    ):
+        if depth is None and not is_pushed(author_id):
+            continue
+        recent = list(Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-pk'
+        ).values_list('pk', 'pub_date')[:depth or settings.FEED_BACKFILL])
+        if not recent:
+            continue
+        # Подписчики пачками: у популярного автора их сотни тысяч
+        followers = (user_id for _, user_id in group)
+        size = max(1, FEED_BATCH_SIZE // len(recent))
+        for chunk in iter(lambda: list(islice(followers, size)), []):
+            FeedEntry.objects.bulk_create(
+                _entries(
+                    (user_id, pk, pub_date)
+                    for user_id in chunk for pk, pub_date in recent
+                ),
+                ignore_conflicts=True,
+            )
+    return FeedEntry.objects.count()
+
+
+def invalidate_timeline(author_id):
+    cache.delete(TIMELINE_KEY.format(author_id))
+
+
+def author_timelines(author_ids):
+    """Короткие списки (pub_date, id) последних постов каждого автора."""
+    keys = {TIMELINE_KEY.format(author_id): author_id
+            for author_id in author_ids}
+    cached = cache.get_many(keys)
+    timelines = {keys[key]: value for key, value in cached.items()}
+    missing = {}
+    for key, author_id in keys.items():
+        if author_id in timelines:
+            continue
+        timeline = list(
+            Post.objects.filter(author_id=author_id).order_by(
+                '-pub_date', '-pk'
+            ).values_list('pub_date', 'pk')[:settings.FEED_TIMELINE_LENGTH]
+        )
+        timelines[author_id] = missing[key] = timeline
+    if missing:
+        cache.set_many(missing, settings.FEED_TIMELINE_TIMEOUT)
+    return timelines
+
+
+def _unique(stream):
+    seen = set()
+    for pub_date, pk in stream:
+        if pk not in seen:
+            seen.add(pk)
+            yield FeedKey(pub_date, pk)
+
+
+def pull_keys(user):
+    """Ключи (pub_date, pk) ленты движка pull, новые первыми.
+
+    Разложенные записи подписчика и кешированные ленты крупных авторов
+    сливаются k-way слиянием на куче, не глубже FEED_PULL_DEPTH.
+    """
+    depth = settings.FEED_PULL_DEPTH
+    pulled = Follow.objects.filter(
+        user=user,
+        author__stats__follower_count__gte=settings.FEED_PUSH_THRESHOLD
+    ).values_list('author_id', flat=True)
+    pushed = FeedEntry.objects.filter(user=user).order_by(
+        '-pub_date', '-post_id'
+    ).values_list('pub_date', 'post_id')[:depth]
+    streams = [list(pushed)]
+    streams.extend(author_timelines(list(pulled)).values())
+    merged = heapq.merge(*streams, reverse=True)
+    return list(islice(_unique(merged), depth))
+
+
+def load_posts(page_obj):
+    """Заменяет ключи страницы постами: один in_bulk на страницу."""
+    keys = list(page_obj.object_list)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [key.pk for key in keys]
+    )
+    page_obj.object_list = [
+        posts[key.pk] for key in keys if key.pk in posts
+    ]
+    return page_obj
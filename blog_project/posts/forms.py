@@ -1,5 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import variants
+from .ingest import ingest
 from .models import Comment, Post
 
 
@@ -14,6 +17,18 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('заполните текст поста')
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return ingest(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit=commit)
+        if 'image' in self.changed_data:
+            variants.schedule(post)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
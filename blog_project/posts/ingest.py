@@ -0,0 +1,74 @@
+"""Приём загруженных картинок без полного декодирования больших файлов.
+
+Размеры берутся из заголовка, слишком большие картинки отклоняются до
+декодирования, а крупные JPEG декодируются сразу в уменьшенном масштабе
+(draft) и сохраняются не больше IMAGE_MAX_SIDE по длинной стороне.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+# формат исходника -> (формат копии, расширение)
+OUTPUT_FORMATS = {
+    'JPEG': ('JPEG', 'jpg'),
+    'PNG': ('PNG', 'png'),
+    'WEBP': ('WEBP', 'webp'),
+}
+DEFAULT_OUTPUT = ('PNG', 'png')
+ORIENTATION = 0x0112
+
+
+def check_size(width, height):
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая: %(width)s×%(height)s пикселей, '
+            'можно не больше %(limit)s.',
+            code='image_too_large',
+            params={
+                'width': width,
+                'height': height,
+                'limit': settings.IMAGE_MAX_PIXELS,
+            },
+        )
+
+
+def _downscale(image, limit):
+    orientation = image.getexif().get(ORIENTATION, 1)
+    # draft выбирает масштаб декодера JPEG (1/2, 1/4, 1/8) не меньше
+    # нужного размера, поэтому полный bitmap в память не попадает.
+    image.draft('RGB', (limit, limit))
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    if orientation != 1:
+        image = ImageOps.exif_transpose(image)
+    return image
+
+
+def ingest(upload):
+    """Проверяет картинку по заголовку и уменьшает слишком большую.
+
+    Возвращает upload как есть или новый файл с уменьшенной копией.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        check_size(*image.size)
+        limit = settings.IMAGE_MAX_SIDE
+        if max(image.size) <= limit:
+            upload.seek(0)
+            return upload
+        format_, extension = OUTPUT_FORMATS.get(image.format, DEFAULT_OUTPUT)
+        image = _downscale(image, limit)
+        if format_ == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(
+            buffer, format_, quality=settings.IMAGE_INGEST_QUALITY,
+            optimize=True
+        )
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(
+        f'{name}.{extension}', buffer.getvalue(), Image.MIME[format_]
+    )
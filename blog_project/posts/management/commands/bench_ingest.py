@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from posts.ingest import ingest
+
+FORMATS = {'jpeg': 'JPEG', 'png': 'PNG'}
+
+
+def _status(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def _reset_peak():
+    """Сбрасывает пик RSS процесса и возвращает текущий RSS.
+
+    ru_maxrss переживает fork и exec, поэтому на Linux пик сбрасывается
+    через clear_refs и читается из VmHWM.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return _status('VmRSS')
+    except OSError:
+        return _peak_rss()
+
+
+def _peak_rss():
+    try:
+        return _status('VmHWM')
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдаёт килобайты, macOS - байты
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _upload(path):
+    with open(path, 'rb') as file_:
+        return SimpleUploadedFile(os.path.basename(path), file_.read())
+
+
+def _full_decode(path):
+    """Прежний путь: оригинал целиком, bitmap декодируется полностью."""
+    upload = _upload(path)
+    with Image.open(upload) as image:
+        image.load()
+        return image.size
+
+
+def _ingest(path):
+    upload = ingest(_upload(path))
+    with Image.open(upload) as image:
+        return image.size
+
+
+def _measure(mode, path, queue):
+    func = _ingest if mode == 'ingest' else _full_decode
+    baseline = _reset_peak()
+    start = time.perf_counter()
+    size = func(path)
+    queue.put((_peak_rss() - baseline, time.perf_counter() - start, size))
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пиковую память (RSS) и время приёма картинок разных '
+        'размеров: полное декодирование против posts.ingest. '
+        'Каждая загрузка идёт в отдельном процессе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1600x1200,4000x3000,8000x6000',
+            help='Размеры картинок через запятую, например 4000x3000.'
+        )
+        parser.add_argument('--format', choices=FORMATS, default='jpeg')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [
+                tuple(int(side) for side in size.split('x'))
+                for size in options['sizes'].split(',')
+            ]
+        except ValueError:
+            raise CommandError('Размеры задаются как ШИРИНАxВЫСОТА.')
+        # spawn: дочерний процесс не наследует память родителя
+        context = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory() as directory:
+            for width, height in sizes:
+                path = self.make_image(
+                    directory, width, height, FORMATS[options['format']]
+                )
+                for mode in ('decode', 'ingest'):
+                    self.report(context, mode, path, width, height)
+
+    @staticmethod
+    def make_image(directory, width, height, format_):
+        path = os.path.join(
+            directory, f'{width}x{height}.{format_.lower()}'
+        )
+        Image.linear_gradient('L').resize((width, height)).convert(
+            'RGB'
+        ).save(path, format_)
+        return path
+
+    def report(self, context, mode, path, width, height):
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(mode, path, queue))
+        process.start()
+        try:
+            peak, elapsed, size = queue.get()
+        except Exception as error:
+            self.stderr.write(f'{width}x{height} {mode}: {error}')
+            return
+        finally:
+            process.join()
+        self.stdout.write(
+            f'{width:>6}x{height:<6} {mode:>6}: '
+            f'+{peak / 2 ** 20:8.1f} MB RSS, {elapsed * 1000:8.1f} ms, '
+            f'результат {size[0]}x{size[1]}'
+        )
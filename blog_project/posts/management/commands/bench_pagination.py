@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from posts.models import Post
+from posts.pagination import NEXT, CursorPaginator, encode_cursor
+
+User = get_user_model()
+SEED_BATCH = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время первой и глубокой страницы ленты '
+        'в режимах page (OFFSET) и cursor (keyset). '
+        'Тестовые посты создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        per_page = settings.POSTS_PER_PAGE
+        deep = max(options['page'], 2)
+        repeat = options['repeat']
+        with transaction.atomic():
+            self.seed(deep * per_page)
+            posts = Post.objects.select_related('group', 'author')
+            boundary = posts.order_by('-pub_date', '-pk')[
+                (deep - 1) * per_page - 1
+            ]
+            token = encode_cursor(deep, NEXT, boundary)
+            cases = (
+                ('page', 1, lambda: self.offset_page(posts, per_page, 1)),
+                ('page', deep,
+                 lambda: self.offset_page(posts, per_page, deep)),
+                ('cursor', 1, lambda: self.cursor_page(posts, per_page, None)),
+                ('cursor', deep,
+                 lambda: self.cursor_page(posts, per_page, token)),
+            )
+            for mode, number, func in cases:
+                elapsed = self.timeit(func, repeat)
+                self.stdout.write(
+                    f'{mode:>6} page {number:>6}: {elapsed * 1000:8.2f} ms'
+                )
+            transaction.set_rollback(True)
+
+    def seed(self, total):
+        missing = total - Post.objects.count()
+        if missing <= 0:
+            return
+        author = User.objects.create_user(username='bench_pagination')
+        self.stdout.write(f'Создаём {missing} постов...')
+        for start in range(0, missing, SEED_BATCH):
+            Post.objects.bulk_create(
+                Post(author=author, text=f'Пост для замера {i}')
+                for i in range(start, min(start + SEED_BATCH, missing))
+            )
+
+    @staticmethod
+    def offset_page(posts, per_page, number):
+        return list(Paginator(posts, per_page).get_page(number))
+
+    @staticmethod
+    def cursor_page(posts, per_page, token):
+        return list(CursorPaginator(posts, per_page).get_page(token))
+
+    @staticmethod
+    def timeit(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import cleanup
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые никто не ссылается, '
+        'и их миниатюры sorl; печатает скорость обхода.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать сирот, ничего не удаляя.'
+        )
+        parser.add_argument(
+            '--quarantine', action='store_true',
+            help=f'Переносить картинки в MEDIA_ROOT/{cleanup.QUARANTINE_DIR} '
+                 'вместо удаления.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=cleanup.BATCH_SIZE,
+            help='Сколько имён сверять с базой одним запросом.'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=cleanup.MIN_AGE,
+            help='Не трогать файлы моложе стольких секунд.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        report = cleanup.collect(
+            dry_run=options['dry_run'],
+            quarantine=options['quarantine'],
+            batch_size=options['batch_size'],
+            min_age=options['min_age'],
+        )
+        verb = 'Будет освобождено' if options['dry_run'] else 'Освобождено'
+        self.stdout.write(
+            f'Просмотрено: {report.scanned}, '
+            f'картинок-сирот: {report.orphans}, '
+            f'миниатюр: {report.thumbnails}'
+        )
+        self.stdout.write(f'{verb}: {report.freed / 1024:.1f} КБ')
+        self.stdout.write(
+            f'Время: {report.elapsed:.2f} с, '
+            f'{report.rate:.0f} файлов/с'
+        )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import advisor
+
+
+class Command(BaseCommand):
+    help = (
+        'Запрашивает страницы блога, объясняет их запросы через '
+        'EXPLAIN QUERY PLAN и сообщает о проходах по таблице и '
+        'сортировках во временном B-дереве.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-sql', action='store_true',
+            help='Печатать и запросы без замечаний.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Советчик разбирает только планы SQLite')
+        flagged = 0
+        for page, sql, problems in advisor.analyze():
+            if not problems and not options['verbose_sql']:
+                continue
+            flagged += bool(problems)
+            self.stdout.write(f'[{page}] {sql}')
+            for problem in problems:
+                self.stdout.write(f'    ! {problem}')
+        self.stdout.write(f'Запросов с замечаниями: {flagged}')
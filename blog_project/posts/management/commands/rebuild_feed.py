@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import feeds
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает материализованные ленты подписок: '
+        'для каждой подписки кладёт последние посты автора.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depth', type=int, default=None,
+            help='Сколько последних постов автора класть в ленту '
+                 '(по умолчанию FEED_BACKFILL).'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = feeds.rebuild(options['depth'])
+        self.stdout.write(f'Записей в лентах: {total}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает полнотекстовый индекс постов (FTS5) '
+        'пачками по id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов читать и вставлять за раз.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = search.reindex(options['batch_size'])
+        self.stdout.write(f'Постов в индексе: {total}')
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p95/p99 времени ответа и число SQL-запросов '
+        'страниц блога и сохраняет результат в JSON для сравнения '
+        'прогонов. Всё, что страницы записали в базу, откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Замер с кешем из настроек; по умолчанию кеш выключен.'
+        )
+        parser.add_argument(
+            '--page', action='append', dest='pages',
+            help='Замерить только эту страницу (можно несколько раз).'
+        )
+        parser.add_argument('--output', help='Куда сохранить JSON.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения p95.'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должно быть больше нуля.')
+        baseline = options['compare'] and benchmark.load(options['compare'])
+        report = benchmark.run(
+            options['iterations'], options['warm'], options['pages']
+        )
+        dataset = ', '.join(
+            f'{table} {total}' for table, total in report['dataset'].items()
+        )
+        self.stdout.write(f'Данные: {dataset}; кеш: {report["cache"]}')
+        self.stdout.write(
+            f'{"страница":<24} {"p50 мс":>9} {"p95 мс":>9} {"p99 мс":>9} '
+            f'{"запросы":>8}'
+        )
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f'{name:<24} {result["p50_ms"]:>9.2f} '
+                f'{result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} '
+                f'{result["queries"]:>8}'
+            )
+        if baseline:
+            self.stdout.write(f'p95 против {options["compare"]}:')
+            for name, old, new, change in benchmark.compare(
+                report, baseline
+            ):
+                self.stdout.write(
+                    f'{name:<24} {old:>9.2f} -> {new:>9.2f} {change:+7.1f}%'
+                )
+        if options['output']:
+            benchmark.save(report, options['output'])
+            self.stdout.write(f'Результат: {options["output"]}')
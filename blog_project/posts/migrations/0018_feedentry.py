@@ -0,0 +1,72 @@
+# Generated by Django 2.2.16 on 2026-10-16 20:37
+
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def backfill(apps, schema_editor):
+    """Ленты по существующим подпискам, как feeds.rebuild()."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    follows = Follow.objects.order_by('author_id').values_list(
+        'author_id', 'user_id'
+    )
+    for author_id, group in groupby(follows.iterator(), key=itemgetter(0)):
+        followers = [user_id for _, user_id in group]
+        # Посты популярных авторов движок pull подтягивает при чтении
+        if settings.FOLLOW_FEED_ENGINE == 'pull' and (
+            len(followers) >= settings.FEED_PUSH_THRESHOLD
+        ):
+            continue
+        recent = list(Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-pk'
+        ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL])
+        if not recent:
+            continue
+        size = max(1, BATCH_SIZE // len(recent))
+        for start in range(0, len(followers), size):
+            FeedEntry.objects.bulk_create(
+                FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+                for user_id in followers[start:start + size]
+                for pk, pub_date in recent
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_auto_20230401_1836'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
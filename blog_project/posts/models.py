@@ -3,6 +3,8 @@ from django.db import models
 
 from core.models import CreatedModel
 
+from .storage import content_storage
+
 User = get_user_model()
 POST_TITLE_LEN = 15
 COMMENT_TITLE_LEN = 15
@@ -33,7 +35,8 @@ class Post(CreatedModel):
         related_name='posts',
         verbose_name='Автор',
         null=True,
-        blank=True
+        blank=True,
+        db_index=False
     )
     pub_date = models.DateTimeField(
         auto_now_add=True,
@@ -47,18 +50,35 @@ class Post(CreatedModel):
         on_delete=models.SET_NULL,
         related_name='posts',
         verbose_name='Группа',
-        help_text='Выберите группу'
+        help_text='Выберите группу',
+        db_index=False
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=content_storage,
         blank=True
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев'
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.text[:POST_TITLE_LEN]}'
@@ -70,7 +90,8 @@ class Comment(CreatedModel):
         related_name='comments',
         on_delete=models.CASCADE,
         verbose_name='Комментарий',
-        help_text='Напишите комментарий'
+        help_text='Напишите комментарий',
+        db_index=False
     )
     pub_date = models.DateTimeField(
         auto_now_add=True,
@@ -88,6 +109,12 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    class Meta:
+        indexes = [models.Index(
+            fields=['post', 'pub_date'],
+            name='comment_post_pub_date_idx'
+        )]
+
     def __str__(self):
         return f'{self.text[:COMMENT_TITLE_LEN]}'
 
@@ -104,6 +131,7 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE,
         verbose_name='тот, на кого подписываются другие',
+        db_index=False
     )
 
     class Meta:
@@ -111,6 +139,135 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='unique_my_field_other_field'
         )]
+        # Подписчики автора (рассылка поста, счётчики) читаются только
+        # из индекса
+        indexes = [models.Index(
+            fields=['author', 'user'],
+            name='follow_author_user_idx'
+        )]
 
     def __str__(self):
         return f'user - {self.user}, author - {self.author}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые иначе пришлось бы считать COUNT."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов'
+    )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'stats - {self.user_id}'
+
+
+class FeedEntry(models.Model):
+    """Строка ленты подписок, разложенная по подписчикам при публикации."""
+    user = models.ForeignKey(
+        User,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_feed_entry'
+        )]
+        indexes = [models.Index(
+            fields=['user', '-pub_date', '-post'],
+            name='feed_user_pub_date_idx'
+        )]
+
+    def __str__(self):
+        return f'user - {self.user_id}, post - {self.post_id}'
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста, построенная при загрузке."""
+    JPEG = 'jpeg'
+    WEBP = 'webp'
+    FORMATS = (
+        (JPEG, 'JPEG'),
+        (WEBP, 'WebP'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        related_name='variants',
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+    )
+    format = models.CharField(
+        max_length=4,
+        choices=FORMATS,
+        verbose_name='Формат'
+    )
+    width = models.PositiveSmallIntegerField(verbose_name='Ширина')
+    height = models.PositiveSmallIntegerField(verbose_name='Высота')
+    image = models.FileField(
+        upload_to='posts/variants/',
+        storage=content_storage,
+        verbose_name='Файл'
+    )
+
+    class Meta:
+        ordering = ('width',)
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+        constraints = [models.UniqueConstraint(
+            fields=['post', 'format', 'width'],
+            name='unique_image_variant'
+        )]
+
+    def __str__(self):
+        return f'post - {self.post_id}, {self.format} {self.width}w'
+
+
+class MediaFile(models.Model):
+    """Файл картинки в хранилище по содержимому и число ссылок на него."""
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Имя файла'
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов'
+    )
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name} - {self.references}'
@@ -0,0 +1,181 @@
+import base64
+import bisect
+import binascii
+from collections import namedtuple
+from collections.abc import Sequence
+
+from django.utils.dateparse import parse_datetime
+
+PAGE_MODE = 'page'
+CURSOR_MODE = 'cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+Cursor = namedtuple('Cursor', ('number', 'direction', 'pub_date', 'pk'))
+
+
+def encode_cursor(number, direction, post):
+    """Упаковывает позицию поста в непрозрачный токен для адресной строки."""
+    raw = f'{number}|{direction}|{post.pub_date.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен. Для испорченного токена возвращает None."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        number, direction, pub_date, pk = raw.decode().split('|')
+        cursor = Cursor(int(number), direction, parse_datetime(pub_date),
+                        int(pk))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if cursor.direction not in (NEXT, PREVIOUS) or cursor.pub_date is None:
+        return None
+    return cursor
+
+
+class CursorPage(Sequence):
+    """Страница ленты, повторяющая интерфейс django.core.paginator.Page."""
+
+    def __init__(self, object_list, number, paginator,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def fragment_key(self):
+        """Ключ кеша карточек страницы: первый и последний пост.
+
+        Номер страницы в курсоре присылает клиент, поэтому ключ строится
+        по тому, что страница на самом деле показывает.
+        """
+        if not self.object_list:
+            return 'empty'
+        return f'{self.object_list[0].pk}-{self.object_list[-1].pk}'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Каждая страница читается одним запросом по диапазону индекса pub_date,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 pk_field='pk'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        # Поля ключа в запросе: лента подписок листается по своему индексу
+        self.date_field = date_field
+        self.pk_field = pk_field
+
+    def _rows(self, queryset):
+        rows = list(queryset[:self.per_page + 1])
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def _ordered(self, sign='-'):
+        return self.object_list.order_by(
+            sign + self.date_field, sign + self.pk_field
+        )
+
+    def first(self):
+        """Первая страница и есть ли за ней ещё."""
+        return self._rows(self._ordered())
+
+    def after(self, cursor):
+        """Страница строго после курсора и есть ли за ней ещё."""
+        date, pk = self.date_field, self.pk_field
+        return self._rows(self._ordered().filter(
+            **{f'{date}__lte': cursor.pub_date}
+        ).exclude(**{date: cursor.pub_date, f'{pk}__gte': cursor.pk}))
+
+    def before(self, cursor):
+        """Страница строго перед курсором и есть ли перед ней ещё."""
+        date, pk = self.date_field, self.pk_field
+        rows, has_previous = self._rows(self._ordered('').filter(
+            **{f'{date}__gte': cursor.pub_date}
+        ).exclude(**{date: cursor.pub_date, f'{pk}__lte': cursor.pk}))
+        rows.reverse()
+        return rows, has_previous
+
+    def get_page(self, token):
+        cursor = decode_cursor(token)
+        if cursor is None:
+            number = 1
+            rows, has_next = self.first()
+            has_previous = False
+        elif cursor.direction == NEXT:
+            number = cursor.number
+            rows, has_next = self.after(cursor)
+            has_previous = True
+        else:
+            rows, has_previous = self.before(cursor)
+            number = cursor.number if has_previous else 1
+            has_next = True
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(number + 1, NEXT, rows[-1])
+        if rows and has_previous:
+            previous_cursor = encode_cursor(number - 1, PREVIOUS, rows[0])
+        return CursorPage(rows, number, self, next_cursor, previous_cursor)
+
+
+class SequenceCursorPaginator(CursorPaginator):
+    """Курсорные страницы списка, упорядоченного по (-pub_date, -pk).
+
+    Элементы - посты или ключи с атрибутами pub_date и pk; позиция
+    курсора ищется двоичным поиском по списку.
+    """
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list, per_page)
+        self._keys = [(item.pub_date, item.pk) for item in object_list]
+        self._keys.reverse()
+
+    def _window(self, start, stop):
+        start, stop = max(start, 0), max(stop, 0)
+        return list(self.object_list[start:stop])
+
+    def first(self):
+        rows = self._window(0, self.per_page)
+        return rows, len(self.object_list) > self.per_page
+
+    def after(self, cursor):
+        # Ключи по возрастанию: меньших курсора столько, сколько левее него
+        start = len(self._keys) - bisect.bisect_left(
+            self._keys, (cursor.pub_date, cursor.pk)
+        )
+        rows = self._window(start, start + self.per_page)
+        return rows, len(self.object_list) > start + self.per_page
+
+    def before(self, cursor):
+        stop = len(self._keys) - bisect.bisect_right(
+            self._keys, (cursor.pub_date, cursor.pk)
+        )
+        return (
+            self._window(stop - self.per_page, stop), stop > self.per_page
+        )
@@ -0,0 +1,261 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Текст постов лежит в виртуальной таблице posts_search (rowid = id поста),
+которую поддерживают сигналы Post. Результаты упорядочены по BM25, а
+страницы листаются по ключу (оценка, id) без OFFSET. На других СУБД поиск
+откатывается к LIKE по Post.text.
+"""
+import base64
+import binascii
+import re
+import unicodedata
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .pagination import NEXT, PREVIOUS, CursorPage
+
+TABLE = 'posts_search'
+MAX_TERMS = 10
+SNIPPET_TOKENS = 16
+# Слово для unicode61: буквы и цифры, подчёркивание - разделитель
+TOKEN = re.compile(r'[^\W_]+')
+# Метки подсветки, которых не бывает в тексте: snippet() вставляет их,
+# а в HTML они превращаются в <mark> уже после экранирования
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SearchCursor = namedtuple(
+    'SearchCursor', ('number', 'direction', 'score', 'pk')
+)
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Безопасное выражение MATCH: слова запроса в кавычках, по префиксу.
+
+    Синтаксис FTS5 (NEAR, OR, скобки) из запроса не пропускается: каждое
+    слово ищется как префикс, все слова обязательны.
+    """
+    terms = re.findall(r'\w+', query or '')[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def index_post(post):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+
+def remove_post(post_id):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def reindex(batch_size=1000):
+    """Пересобирает индекс пачками по id; возвращает число постов."""
+    if not enabled():
+        return 0
+    total = 0
+    last = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        while True:
+            rows = list(Post.objects.filter(pk__gt=last).order_by(
+                'pk'
+            ).values_list('pk', 'text')[:batch_size])
+            if not rows:
+                break
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)', rows
+            )
+            total += len(rows)
+            last = rows[-1][0]
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return total
+
+
+def filter_posts(queryset, query):
+    """Посты queryset, подходящие под запрос; для поиска в админке."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset
+    if not enabled():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression]
+    ))
+
+
+def _fold(word):
+    """Слово так, как его видит токенизатор unicode61 remove_diacritics 2."""
+    decomposed = unicodedata.normalize('NFD', word.casefold())
+    return ''.join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+
+
+def snippet(text, query, tokens=SNIPPET_TOKENS):
+    """Отрывок text из tokens слов с наибольшим числом совпадений.
+
+    Строится в Python для постов уже выбранной страницы: snippet() FTS5
+    потребовал бы ещё раз выполнить MATCH или считать отрывки всех
+    найденных постов до LIMIT. Слова запроса ищутся по префиксу,
+    совпадения обрамлены MARK_START и MARK_END.
+    """
+    terms = tuple(_fold(term) for term in TOKEN.findall(query or ''))
+    words = list(TOKEN.finditer(text))
+    if not words or not terms:
+        return text
+    hits = {
+        index for index, word in enumerate(words)
+        if _fold(word.group()).startswith(terms)
+    }
+    start = max(
+        sorted(hits) or [0],
+        key=lambda first: sum(first <= hit < first + tokens for hit in hits)
+    )
+    start = max(0, min(start, len(words) - tokens))
+    end = min(len(words), start + tokens)
+    parts = ['…'] if start else []
+    position = words[start].start() if start else 0
+    for index in range(start, end):
+        word = words[index]
+        parts.append(text[position:word.start()])
+        parts.append(
+            f'{MARK_START}{word.group()}{MARK_END}' if index in hits
+            else word.group()
+        )
+        position = word.end()
+    parts.append('…' if end < len(words) else text[position:])
+    return ''.join(parts)
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(MARK_START, '<mark>').replace(
+            MARK_END, '</mark>'
+        )
+    )
+
+
+def encode_cursor(number, direction, score, pk):
+    # repr сохраняет float без потерь: сравнение по ключу будет точным
+    raw = f'{number}|{direction}|{score!r}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        number, direction, score, pk = raw.decode().split('|')
+        cursor = SearchCursor(int(number), direction, float(score), int(pk))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if cursor.direction not in (NEXT, PREVIOUS):
+        return None
+    return cursor
+
+
+class SearchPaginator:
+    """Страницы результатов поиска по ключу (оценка BM25, id).
+
+    Чем меньше bm25(), тем выше пост в выдаче. Посты страницы читаются
+    одним запросом, у каждого есть snippet с подсвеченными словами.
+    """
+    is_cursor = True
+
+    def __init__(self, query, per_page):
+        self.query = query
+        self.expression = match_expression(query)
+        self.per_page = int(per_page)
+
+    def _rows(self, cursor, descending):
+        sql = (
+            f'SELECT rowid AS id, bm25({TABLE}) AS score '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+        )
+        params = [self.expression]
+        order = 'DESC' if descending else 'ASC'
+        if cursor is not None:
+            sign = '<' if descending else '>'
+            sql = (
+                f'SELECT id, score FROM ({sql}) '
+                f'WHERE score {sign} %s OR (score = %s AND id {sign} %s)'
+            )
+            params += [cursor.score, cursor.score, cursor.pk]
+        sql += f' ORDER BY score {order}, id {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            rows = db_cursor.fetchall()
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def _posts(self, rows):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows]
+        )
+        found = []
+        for pk, score in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.search_score = score
+                post.snippet = highlight(snippet(post.text, self.query))
+                found.append(post)
+        return found
+
+    def _fallback_page(self):
+        posts = list(Post.objects.select_related('author', 'group').filter(
+            text__icontains=self.query
+        )[:self.per_page])
+        for post in posts:
+            post.snippet = post.text
+        return CursorPage(posts, 1, self)
+
+    def get_page(self, token):
+        if not self.expression:
+            return CursorPage([], 1, self)
+        if not enabled():
+            return self._fallback_page()
+        cursor = decode_cursor(token)
+        if cursor is None:
+            number = 1
+            rows, has_next = self._rows(None, False)
+            has_previous = False
+        elif cursor.direction == NEXT:
+            number = cursor.number
+            rows, has_next = self._rows(cursor, False)
+            has_previous = True
+        else:
+            rows, has_previous = self._rows(cursor, True)
+            rows.reverse()
+            number = cursor.number if has_previous else 1
+            has_next = True
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(
+                number + 1, NEXT, rows[-1][1], rows[-1][0]
+            )
+        if rows and has_previous:
+            previous_cursor = encode_cursor(
+                number - 1, PREVIOUS, rows[0][1], rows[0][0]
+            )
+        return CursorPage(
+            self._posts(rows), number, self, next_cursor, previous_cursor
+        )
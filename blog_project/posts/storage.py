@@ -0,0 +1,57 @@
+"""Хранилище картинок постов, адресуемое по содержимому.
+
+Файл называется SHA-256 своего содержимого, поэтому одна и та же картинка,
+загруженная много раз, лежит на диске один раз, а sorl строит для неё одну
+миниатюру. Сколько постов ссылается на файл, считает MediaFile
+(posts.counters).
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_digest(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(name, digest):
+    """Имя файла по содержимому: каталог и расширение берутся из name."""
+    directory, filename = os.path.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(
+        directory, digest[:2], digest[2:4], digest + extension
+    ).replace('\\', '/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, который не пишет одинаковое содержимое дважды."""
+
+    def get_available_name(self, name, max_length=None):
+        # Имя по содержимому не конфликтует: файл с ним - тот же файл
+        return name
+
+    def _save(self, name, content):
+        name = content_name(name, content_digest(content))
+        if self.exists(name):
+            # Свежее время изменения не даёт сборщику (posts.cleanup)
+            # удалить файл, на который вот-вот сошлётся новый пост
+            os.utime(self.path(name))
+            return name
+        # Пишем во временный файл и атомарно переименовываем: читатель не
+        # увидит недописанный файл, а одновременная загрузка того же
+        # содержимого просто заменит его таким же.
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,39 @@
+from django import template
+
+from posts import thumbnails, variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(file_, geometry, **options):
+    """Готовая миниатюра или None; недостающую ставит в очередь."""
+    thumbnail = thumbnails.ready_thumbnail(file_, geometry, **options)
+    if thumbnail is None:
+        thumbnails.schedule(file_, geometry, **options)
+    return thumbnail
+
+
+@register.simple_tag(takes_context=True)
+def post_thumbnail(context, post):
+    """Миниатюра карточки поста из пакета страницы, если он есть."""
+    batch = context.get('post_thumbnails')
+    if batch is None:
+        return ready_thumbnail(
+            post.image, thumbnails.POST_GEOMETRY, **thumbnails.POST_OPTIONS
+        )
+    return batch.get(post)
+
+
+@register.inclusion_tag('posts/includes/post_picture.html', takes_context=True)
+def post_picture(context, post):
+    """Картинка поста: варианты через srcset, пока их нет - миниатюра."""
+    batch = context.get('post_thumbnails')
+    picture = variants.picture(
+        post.variants.all() if batch is None else batch.variants(post)
+    )
+    return {
+        'post': post,
+        'picture': picture,
+        'thumbnail': None if picture else post_thumbnail(context, post),
+    }
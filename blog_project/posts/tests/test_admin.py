@@ -0,0 +1,86 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+SEED_POSTS = 100000
+SEED_BATCH = 5000
+
+
+class AdminChangeListTests(TestCase):
+    """Число запросов списков в админке не зависит от размера таблиц."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}', description='-')
+            for i in range(20)
+        )
+        groups = list(Group.objects.order_by('pk'))
+        start = timezone.make_aware(datetime.datetime(2020, 1, 1))
+        for offset in range(0, SEED_POSTS, SEED_BATCH):
+            Post.objects.bulk_create(
+                Post(author=cls.admin, text=f'Пост {i}',
+                     group=groups[i % len(groups)])
+                for i in range(offset, offset + SEED_BATCH)
+            )
+        # auto_now_add не даёт задать дату при создании: раскладываем
+        # посты по часам, от 2020 года вперёд
+        posts = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        for number, pk in enumerate(posts[::1000]):
+            Post.objects.filter(pk__gte=pk, pk__lt=pk + 1000).update(
+                pub_date=start + datetime.timedelta(days=number * 10)
+            )
+        cls.post = Post.objects.get(pk=posts[0])
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.admin, text=f'Коммент {i}')
+            for i in range(200)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, data=None):
+        return self.client.get(
+            reverse(f'admin:posts_{model}_changelist'), data or {}
+        )
+
+    def test_post_changelist_query_count(self):
+        """Список постов: фиксированное число запросов на 100k постов."""
+        # сессия, пользователь, два запроса оценки числа строк, строки
+        # страницы, две границы дат, годы (три непустых и один пустой
+        # поиск); подписи групп берутся из строк страницы
+        with self.assertNumQueries(11):
+            response = self.changelist('post')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['cl'].result_count, SEED_POSTS
+        )
+        self.assertContains(response, 'Группа 0')
+
+    def test_post_date_hierarchy_by_month(self):
+        """Месяцы года находятся поиском по индексу на каждый месяц."""
+        response = self.changelist('post', {'pub_date__year': 2021})
+        self.assertEqual(response.status_code, 200)
+        queryset = response.context['cl'].queryset
+        with self.assertNumQueries(13):
+            months = queryset.dates('pub_date', 'month')
+        self.assertEqual(
+            [month.month for month in months], list(range(1, 13))
+        )
+
+    def test_comment_changelist_query_count(self):
+        """Комментарии зарегистрированы, пост и автор подгружаются JOIN."""
+        with self.assertNumQueries(9):
+            response = self.changelist('comment')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Коммент 199')
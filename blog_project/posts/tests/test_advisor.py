@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import advisor
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+FEED_PAGES = (
+    'index', 'index, page 2', 'index, cursor', 'group_posts', 'profile',
+    'post_detail', 'follow_index, push', 'follow_index, pull',
+    'follow_index, push, cursor', 'follow_index, pull, cursor',
+)
+
+
+class IndexAdvisorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=reader, author=author)
+        for number in range(25):
+            post = Post.objects.create(
+                author=author, group=group, text=f'Пост {number}'
+            )
+        Comment.objects.create(post=post, author=reader, text='Коммент')
+
+    def test_problems(self):
+        """Проход по таблице и временная сортировка - замечания."""
+        plan = [
+            (2, 0, 'SCAN posts_post'),
+            (3, 0, 'SCAN posts_post USING INDEX post_author_pub_date_idx'),
+            (4, 0, 'SEARCH posts_group USING INTEGER PRIMARY KEY (rowid=?)'),
+            (5, 0, 'USE TEMP B-TREE FOR ORDER BY'),
+        ]
+        self.assertEqual(
+            advisor.problems(plan),
+            ['SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY']
+        )
+
+    def test_feed_pages_use_indexes(self):
+        """Запросы лент, профиля и поста идут по индексам."""
+        report = advisor.analyze()
+        self.assertTrue(
+            {page for page, _, _ in report}.issuperset(FEED_PAGES)
+        )
+        flagged = [
+            (page, sql, problems) for page, sql, problems in report
+            if problems and page in FEED_PAGES
+        ]
+        self.assertEqual(flagged, [])
+
+    def test_command(self):
+        """Команда печатает число запросов с замечаниями."""
+        out = StringIO()
+        call_command('index_advisor', stdout=out)
+        self.assertIn('Запросов с замечаниями:', out.getvalue())
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import benchmark, counters, feeds
+from posts.models import Comment, FeedEntry, Follow, Group, Post, UserStats
+
+USERS = 30
+GROUPS = 3
+POSTS = 300
+COMMENTS = 200
+FOLLOWS = 4
+PAGES = (
+    'index', 'group_posts', 'profile', 'post_detail', 'search',
+    'follow_index, push', 'follow_index, pull',
+)
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.created = benchmark.seed(
+            users=USERS, groups=GROUPS, posts=POSTS, comments=COMMENTS,
+            follows=FOLLOWS, seed=1,
+        )
+
+    def test_seed_sizes(self):
+        """Созданы строки всех таблиц в заказанном количестве."""
+        self.assertEqual(Post.objects.count(), POSTS)
+        self.assertEqual(Comment.objects.count(), COMMENTS)
+        self.assertEqual(Group.objects.count(), GROUPS)
+        self.assertEqual(UserStats.objects.count(), USERS)
+        self.assertEqual(self.created['follows'], Follow.objects.count())
+        self.assertEqual(
+            self.created['feed_entries'], FeedEntry.objects.count()
+        )
+
+    def test_seed_consistent(self):
+        """Счётчики сходятся, даты постов идут по порядку id."""
+        self.assertEqual(counters.recount(), 0)
+        dates = list(
+            Post.objects.order_by('pk').values_list('pub_date', flat=True)
+        )
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater(dates[-1], dates[0])
+
+    def test_follow_graph_skewed(self):
+        """Подписчики сосредоточены у немногих авторов."""
+        followers = sorted(
+            UserStats.objects.values_list('follower_count', flat=True),
+            reverse=True
+        )
+        self.assertGreater(followers[0], 3 * sum(followers) / USERS)
+
+    def test_rebuild_matches_backfill(self):
+        """Пересборка лент даёт то же, что добавление каждой подписки."""
+        rebuilt = set(FeedEntry.objects.values_list('user_id', 'post_id'))
+        FeedEntry.objects.all().delete()
+        for user_id, author_id in Follow.objects.values_list(
+            'user_id', 'author_id'
+        ):
+            feeds.backfill(user_id, author_id)
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('user_id', 'post_id')),
+            rebuilt
+        )
+
+    def test_run(self):
+        """Замер отдаёт перцентили и число запросов всех страниц."""
+        report = benchmark.run(iterations=2)
+        self.assertTrue(set(report['results']).issuperset(PAGES))
+        for result in report['results'].values():
+            self.assertEqual(result['status'], 200)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['queries'], 0)
+        self.assertEqual(report['dataset']['posts'], POSTS)
+
+    def test_command_output_and_compare(self):
+        """Команда пишет JSON и сравнивает с прошлым прогоном."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.json')
+            call_command(
+                'run_benchmarks', iterations=1, pages=['index'],
+                output=path, stdout=StringIO()
+            )
+            with open(path) as file_:
+                self.assertEqual(list(json.load(file_)['results']), ['index'])
+            out = StringIO()
+            call_command(
+                'run_benchmarks', iterations=1, pages=['index'],
+                compare=path, stdout=out
+            )
+        self.assertIn('p95 против', out.getvalue())
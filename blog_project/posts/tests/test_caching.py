@@ -0,0 +1,163 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts.caching import ALL_POSTS, bump_feed_version, cache_feed_page
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author_1 = User.objects.create_user(username='author_1')
+        cls.author_2 = User.objects.create_user(username='author_2')
+        cls.user_1 = User.objects.create_user(username='reader_1')
+        cls.user_2 = User.objects.create_user(username='reader_2')
+        cls.post_1 = Post.objects.create(author=cls.author_1, text='Пост 1')
+        cls.post_2 = Post.objects.create(author=cls.author_2, text='Пост 2')
+        Follow.objects.create(user=cls.user_1, author=cls.author_1)
+        Follow.objects.create(user=cls.user_2, author=cls.author_2)
+
+    def setUp(self):
+        cache.clear()
+        self.client_1 = Client()
+        self.client_1.force_login(self.user_1)
+        self.client_2 = Client()
+        self.client_2.force_login(self.user_2)
+
+    def test_follow_fragments_are_per_user(self):
+        """Пользователи не видят кешированные ленты друг друга."""
+        address = reverse('posts:follow_index')
+        for _ in range(2):
+            response_1 = self.client_1.get(address)
+            response_2 = self.client_2.get(address)
+            self.assertContains(response_1, self.post_1.text)
+            self.assertNotContains(response_1, self.post_2.text)
+            self.assertContains(response_2, self.post_2.text)
+            self.assertNotContains(response_2, self.post_1.text)
+
+    def test_header_is_not_cached(self):
+        """Шапка с именем пользователя рендерится для каждого запроса."""
+        address = reverse('posts:follow_index')
+        self.client_1.get(address)
+        response = self.client_2.get(address)
+        self.assertContains(response, self.user_2.username)
+        self.assertNotContains(response, self.user_1.username)
+
+    def test_pages_are_not_shared_between_users(self):
+        """Главная и профиль не отдают другим шапку и подписку вошедшего."""
+        addresses = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.author_1}),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client_1.get(address)
+                self.assertContains(response, self.user_1.username)
+                guest = Client().get(address)
+                self.assertNotContains(guest, 'Выйти')
+                for response in (guest, self.client_2.get(address)):
+                    self.assertNotContains(response, self.user_1.username)
+                    self.assertNotContains(response, 'Отписаться')
+
+    def test_new_post_changes_fragment_version(self):
+        """Новый пост сразу виден в закешированном профиле."""
+        address = reverse(
+            'posts:profile', kwargs={'username': self.author_1}
+        )
+        self.client_1.get(address)
+        post = Post.objects.create(author=self.author_1, text='Свежий пост')
+        self.assertContains(self.client_1.get(address), post.text)
+
+
+class FeedVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group_1 = Group.objects.create(
+            title='Группа 1', slug='group-1', description='Описание'
+        )
+        cls.group_2 = Group.objects.create(
+            title='Группа 2', slug='group-2', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_moving_post_invalidates_both_groups(self):
+        """Смена группы поста сбрасывает страницы обеих групп."""
+        post = Post.objects.create(
+            author=self.author, text='Переезжающий пост', group=self.group_1
+        )
+        address_1 = reverse('posts:group_posts', args=(self.group_1.slug,))
+        address_2 = reverse('posts:group_posts', args=(self.group_2.slug,))
+        self.assertContains(self.author_client.get(address_1), post.text)
+        self.assertNotContains(self.author_client.get(address_2), post.text)
+        self.author_client.post(
+            reverse('posts:post_edit', args=(post.id,)),
+            data={'text': post.text, 'group': self.group_2.id}
+        )
+        self.assertNotContains(self.author_client.get(address_1), post.text)
+        self.assertContains(self.author_client.get(address_2), post.text)
+
+
+class PageStampedeTests(SimpleTestCase):
+    readers = 5
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+        self.release = threading.Event()
+        self.page = cache_feed_page(60, ALL_POSTS)(self.view)
+
+    def view(self, request):
+        with self.calls_lock:
+            self.calls += 1
+            number = self.calls
+        self.release.wait(5)
+        return HttpResponse(f'render {number}')
+
+    def get(self, responses):
+        responses.append(self.page(RequestFactory().get('/')))
+
+    def test_one_reader_revalidates_stale_page(self):
+        """Устаревшую страницу пересчитывает один, остальным - копия."""
+        self.release.set()
+        self.get([])
+        self.release.clear()
+        bump_feed_version(ALL_POSTS)
+        responses = []
+        threads = [
+            threading.Thread(target=self.get, args=(responses,))
+            for _ in range(self.readers)
+        ]
+        for thread in threads:
+            thread.start()
+        # Пересчёт держится, пока остальные не получат ответ
+        for _ in range(500):
+            if len(responses) >= self.readers - 1:
+                break
+            time.sleep(0.01)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 2)
+        stale = [
+            response for response in responses
+            if response.content == b'render 1'
+        ]
+        self.assertEqual(len(stale), self.readers - 1)
+        self.assertIn(b'render 2', [r.content for r in responses])
+        for response in stale:
+            self.assertIn('no-cache', response['Cache-Control'])
+            self.assertIn('max-age=0', response['Cache-Control'])
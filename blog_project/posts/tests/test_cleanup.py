@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+
+from posts import cleanup
+from posts.models import Post
+from posts.storage import content_storage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def png(color):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20), color).save(buffer, 'PNG')
+    return SimpleUploadedFile('image.png', buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class CollectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.author, text='Пост', image=png('red')
+        )
+        self.orphan = self.post.image.name
+        self.thumbnail = get_thumbnail(self.post.image, '10x10')
+        self.post.image = png('blue')
+        self.post.save()
+        self.live = self.post.image.name
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_orphan_and_thumbnails_are_removed(self):
+        """Заменённая картинка и её миниатюры удаляются, живая остаётся."""
+        report = cleanup.collect(min_age=0, batch_size=1)
+        self.assertEqual(report.orphans, 1)
+        self.assertFalse(content_storage.exists(self.orphan))
+        self.assertFalse(default.storage.exists(self.thumbnail.name))
+        self.assertIsNone(default.kvstore.get(self.thumbnail))
+        self.assertTrue(content_storage.exists(self.live))
+
+    def test_dry_run_keeps_files(self):
+        """Пробный прогон только считает сирот."""
+        report = cleanup.collect(min_age=0, dry_run=True)
+        self.assertEqual(report.orphans, 1)
+        self.assertGreater(report.freed, 0)
+        self.assertTrue(content_storage.exists(self.orphan))
+        self.assertTrue(default.storage.exists(self.thumbnail.name))
+
+    def test_quarantine_moves_orphan(self):
+        """В режиме карантина картинка переносится, а не удаляется."""
+        cleanup.collect(min_age=0, quarantine=True)
+        self.assertFalse(content_storage.exists(self.orphan))
+        self.assertTrue(content_storage.exists(
+            cleanup.QUARANTINE_DIR + self.orphan
+        ))
+
+    def test_young_files_are_kept(self):
+        """Свежие файлы не трогаются: их пост может быть ещё не сохранён."""
+        report = cleanup.collect()
+        self.assertEqual(report.orphans, 0)
+        self.assertTrue(content_storage.exists(self.orphan))
+
+    def test_missing_source_drops_thumbnails(self):
+        """Миниатюры картинки, удалённой с диска вручную, удаляются."""
+        os.remove(content_storage.path(self.orphan))
+        report = cleanup.collect(min_age=0)
+        self.assertEqual(report.thumbnails, 1)
+        self.assertFalse(default.storage.exists(self.thumbnail.name))
+
+    def test_unknown_thumbnail_file_is_removed(self):
+        """Файл в каталоге миниатюр без записи sorl удаляется."""
+        name = default.storage.save('cache/ab/cd/stray.jpg', ContentFile(b'x'))
+        report = cleanup.collect(min_age=0)
+        self.assertEqual(report.thumbnails, 1)
+        self.assertFalse(default.storage.exists(name))
+
+    def test_command_reports_rate(self):
+        """Команда печатает итог и скорость обхода."""
+        out = StringIO()
+        call_command('collect_media', '--dry-run', '--min-age=0', stdout=out)
+        self.assertIn('файлов/с', out.getvalue())
+        self.assertTrue(content_storage.exists(self.orphan))
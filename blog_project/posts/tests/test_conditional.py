@@ -0,0 +1,83 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+
+    def test_not_modified_costs_one_query(self):
+        """Совпавший ETag даёт 304 за один запрос к базе."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                etag = self.guest_client.get(address)['ETag']
+                with self.assertNumQueries(1):
+                    response = self.guest_client.get(
+                        address, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_last_modified(self):
+        """If-Modified-Since с актуальной датой даёт 304."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                modified = self.guest_client.get(address)['Last-Modified']
+                response = self.guest_client.get(
+                    address, HTTP_IF_MODIFIED_SINCE=modified
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_changes_reset_etag(self):
+        """Новый комментарий меняет ETag страниц с постом."""
+        etags = [self.guest_client.get(address)['ETag']
+                 for address in self.addresses]
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        for address, etag in zip(self.addresses, etags):
+            with self.subTest(address=address):
+                response = self.guest_client.get(
+                    address, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_session(self):
+        """Разные пользователи получают разные ETag."""
+        author_client = Client()
+        author_client.force_login(self.author)
+        address = self.addresses[-1]
+        self.assertNotEqual(
+            self.guest_client.get(address)['ETag'],
+            author_client.get(address)['ETag']
+        )
@@ -0,0 +1,176 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import FeedEntry, Follow, Post
+
+User = get_user_model()
+NUMBER_OF_POSTS_TEST = 5
+BACKFILL_TEST = 3
+PUSH_THRESHOLD_TEST = 2
+
+
+@override_settings(FEED_BACKFILL=BACKFILL_TEST)
+class FanOutFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='follower')
+        for i in range(NUMBER_OF_POSTS_TEST):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def follow(self):
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+
+    def test_follow_backfills_recent_posts(self):
+        """Подписка кладёт в ленту последние посты автора."""
+        self.follow()
+        recent = Post.objects.filter(author=self.author)[:BACKFILL_TEST]
+        self.assertEqual(
+            set(self.user.feed_entries.values_list('post_id', flat=True)),
+            {post.pk for post in recent}
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост сразу появляется в ленте подписчика."""
+        self.follow()
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    def test_unfollow_cleans_feed(self):
+        """Отписка очищает ленту от постов автора."""
+        self.follow()
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+        self.assertFalse(self.user.feed_entries.exists())
+
+    def test_rebuild_feed_command(self):
+        """Команда rebuild_feed восстанавливает ленты по подпискам."""
+        Follow.objects.create(user=self.user, author=self.author)
+        FeedEntry.objects.all().delete()
+        call_command(
+            'rebuild_feed', depth=NUMBER_OF_POSTS_TEST, stdout=StringIO()
+        )
+        self.assertEqual(
+            self.user.feed_entries.count(), NUMBER_OF_POSTS_TEST
+        )
+
+    @override_settings(POSTS_PAGINATION='cursor', POSTS_PER_PAGE=2)
+    def test_cursor_pagination(self):
+        """Лента push листается курсором по записям ленты без повторов."""
+        self.follow()
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.author)
+        for i in range(2):
+            Post.objects.create(author=self.author, text=f'Новый пост {i}')
+        address = reverse('posts:follow_index')
+        page_obj = self.authorized_client.get(address).context['page_obj']
+        seen = list(page_obj)
+        while page_obj.has_next():
+            page_obj = self.authorized_client.get(
+                address, {'cursor': page_obj.next_cursor}
+            ).context['page_obj']
+            seen.extend(page_obj)
+        self.assertEqual(seen, list(Post.objects.filter(
+            feed_entries__user=self.user
+        ).order_by('-pub_date', '-pk')))
+        self.assertEqual(page_obj.number, 3)
+
+    def test_migration_backfills_existing_follows(self):
+        """Миграция таблицы лент заполняет её по старым подпискам."""
+        Follow.objects.create(user=self.user, author=self.author)
+        FeedEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0018_feedentry')
+        migration.backfill(apps, None)
+        self.assertEqual(self.user.feed_entries.count(), BACKFILL_TEST)
+
+
+@override_settings(
+    FOLLOW_FEED_ENGINE='pull', FEED_PUSH_THRESHOLD=PUSH_THRESHOLD_TEST
+)
+class PullFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='follower')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Follow.objects.create(user=cls.user, author=cls.star)
+        Follow.objects.create(user=cls.other, author=cls.star)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_popular_author_is_pulled(self):
+        """Посты популярного автора не раскладываются по лентам."""
+        star_post = Post.objects.create(author=self.star, text='Звезда')
+        author_post = Post.objects.create(author=self.author, text='Автор')
+        self.assertFalse(FeedEntry.objects.filter(post=star_post).exists())
+        self.assertTrue(
+            FeedEntry.objects.filter(post=author_post).exists()
+        )
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Лента сливает разложенные и подтянутые посты по дате."""
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate(
+                [self.star, self.author, self.star, self.author]
+            )
+        ]
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), posts[::-1])
+
+    def test_timeline_is_cached(self):
+        """Повторное чтение ленты берёт ленту автора из кеша."""
+        Post.objects.create(author=self.star, text='Звезда')
+        address = reverse('posts:follow_index')
+        self.authorized_client.get(address)
+        with self.assertNumQueries(5):
+            self.authorized_client.get(address)
+
+    @override_settings(POSTS_PAGINATION='cursor', POSTS_PER_PAGE=2)
+    def test_cursor_pagination(self):
+        """В режиме cursor лента pull листается курсором, как остальные."""
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate([self.star, self.author] * 3)
+        ]
+        address = reverse('posts:follow_index')
+        response = self.authorized_client.get(address)
+        page_obj = response.context['page_obj']
+        seen = list(page_obj)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+        self.assertNotContains(response, '?page=')
+        while page_obj.has_next():
+            previous = page_obj
+            page_obj = self.authorized_client.get(
+                address, {'cursor': page_obj.next_cursor}
+            ).context['page_obj']
+            seen.extend(page_obj)
+        self.assertEqual(seen, posts[::-1])
+        self.assertEqual(page_obj.number, 3)
+        back = self.authorized_client.get(
+            address, {'cursor': page_obj.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(previous))
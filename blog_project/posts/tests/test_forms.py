@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -8,6 +9,7 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.models import Comment, Group, Post
+from posts.storage import content_name
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
@@ -42,6 +44,13 @@ class PostFormCreateEditTests(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def stored_name(self, name):
+        """Имя, под которым картинка лежит в хранилище по содержимому."""
+        return content_name(
+            f'{img_folder}{name}',
+            hashlib.sha256(PostFormCreateEditTests.test_image).hexdigest()
+        )
+
     def setUp(self):
         self.guest_client = Client()
         self.authorized_client_not_author = Client()
@@ -80,7 +89,7 @@ class PostFormCreateEditTests(TestCase):
 
         self.assertEqual(post_content['text'], post.text)
         self.assertEqual(post_content['group'], post.group.pk)
-        self.assertEqual(f'posts/{uploaded.name}', post.image)
+        self.assertEqual(self.stored_name(uploaded.name), post.image)
         self.assertEqual(PostFormCreateEditTests.author, post.author)
         self.assertEqual(
             posts_nbr_before_creation + ONE_POST,
@@ -169,7 +178,7 @@ class PostFormCreateEditTests(TestCase):
         self.assertEqual(edited_post.author, created_post.author)
         self.assertEqual(edited_post.text, post_edit_content['text'])
         self.assertEqual(edited_post.group.pk, post_edit_content['group'])
-        self.assertEqual(f'posts/{uploaded.name}', edited_post.image)
+        self.assertEqual(self.stored_name(uploaded.name), edited_post.image)
 
     def test_post_edit_not_authorized(self):
         """Пост не отредактирован неавторизованным пользователем."""
@@ -0,0 +1,55 @@
+from io import BytesIO
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.ingest import ingest
+
+
+def upload(size, format_='JPEG', name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, format_)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(IMAGE_MAX_PIXELS=200 * 200, IMAGE_MAX_SIDE=100)
+class IngestTests(TestCase):
+    def test_small_image_is_kept(self):
+        """Картинка в пределах лимитов сохраняется как есть."""
+        original = upload((80, 60))
+        self.assertIs(ingest(original), original)
+
+    def test_large_image_is_downscaled(self):
+        """Длинная сторона большой картинки уменьшается до IMAGE_MAX_SIDE."""
+        result = ingest(upload((180, 120)))
+        with Image.open(result) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (100, 67)))
+        self.assertEqual(result.name, 'photo.jpg')
+
+    def test_png_stays_png(self):
+        """Уменьшенная картинка не в JPEG сохраняется в PNG."""
+        result = ingest(upload((150, 150), 'PNG', 'photo.gif'))
+        with Image.open(result) as image:
+            self.assertEqual((image.format, image.size), ('PNG', (100, 100)))
+        self.assertEqual(result.name, 'photo.png')
+
+    def test_too_many_pixels_rejected_before_decoding(self):
+        """Картинка больше лимита отклоняется по заголовку."""
+        with mock.patch('PIL.ImageFile.ImageFile.load',
+                        side_effect=AssertionError('декодирование')):
+            with self.assertRaises(ValidationError):
+                ingest(upload((300, 300)))
+
+    def test_form_reports_too_large_image(self):
+        """Форма поста показывает ошибку для слишком большой картинки."""
+        form = PostForm(
+            data={'text': 'Пост'}, files={'image': upload((300, 300))}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'image_too_large'
+        )
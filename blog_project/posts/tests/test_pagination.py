@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.pagination import (NEXT, CursorPaginator, decode_cursor,
+                              encode_cursor)
+
+User = get_user_model()
+NUMBER_OF_POSTS_TEST = 25
+PER_PAGE_TEST = 10
+
+
+@override_settings(POSTS_PAGINATION='cursor')
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([
+            Post(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый пост_{i+1}',
+            ) for i in range(NUMBER_OF_POSTS_TEST)
+        ])
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_pages_follow_keyset_order(self):
+        """Страницы по курсору идут подряд без пропусков и повторов."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE_TEST)
+        page = paginator.get_page(None)
+        seen = list(page)
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, self.ordered)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), NUMBER_OF_POSTS_TEST % PER_PAGE_TEST)
+
+    def test_previous_cursor_returns_same_page(self):
+        """Возврат назад отдаёт ту же страницу, что и переход вперёд."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE_TEST)
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertEqual(back.number, 2)
+        back = paginator.get_page(back.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_gives_first_page(self):
+        """Испорченный токен не ломает страницу."""
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        response = self.guest_client.get(
+            reverse('posts:index') + '?cursor=not-a-cursor'
+        )
+        self.assertEqual(list(response.context['page_obj']),
+                         self.ordered[:PER_PAGE_TEST])
+
+    def test_forged_cursor_number_does_not_poison_fragment(self):
+        """Курсор с чужим номером страницы не подменяет карточки страницы 1."""
+        forged = encode_cursor(1, NEXT, self.ordered[PER_PAGE_TEST - 1])
+        address = reverse('posts:index')
+        response = self.guest_client.get(address, {'cursor': forged})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            self.ordered[PER_PAGE_TEST:2 * PER_PAGE_TEST]
+        )
+        response = self.guest_client.get(address)
+        self.assertContains(response, self.ordered[0].text)
+        self.assertNotContains(
+            response, self.ordered[PER_PAGE_TEST].text + '<'
+        )
+
+    def test_feeds_use_cursor_links(self):
+        """Ленты отдают курсорные ссылки вместо номеров страниц."""
+        addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.guest_client.get(address)
+                page_obj = response.context['page_obj']
+                self.assertContains(
+                    response, f'?cursor={page_obj.next_cursor}'
+                )
+                self.assertNotContains(response, '?page=')
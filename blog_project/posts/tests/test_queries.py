@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import feeds, urls
+from posts.models import Comment, Follow, Group, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, QUERY_INSPECTOR='raise')
+class QueryBudgetTests(TestCase):
+    """Каждый адрес posts укладывается в бюджет запросов без N+1."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(4)
+        ]
+        cls.reader = User.objects.create_user(username='reader')
+        groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            ) for i in range(2)
+        ]
+        for author in cls.authors[1:]:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(12):
+            Post.objects.create(
+                author=cls.authors[i % 4],
+                group=groups[i % 2],
+                text=f'Пост номер {i}',
+                image=SimpleUploadedFile(f'{i}.gif', GIF, 'image/gif'),
+            )
+        cls.post = Post.objects.create(
+            author=cls.reader, text='Пост читателя', group=groups[0],
+            image=SimpleUploadedFile('reader.gif', GIF, 'image/gif'),
+        )
+        for author in cls.authors:
+            Comment.objects.create(post=cls.post, author=author, text='-')
+        cls.group = groups[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def cases(self):
+        """(имя адреса, метод, аргументы, данные) для каждого адреса."""
+        author = self.authors[0].username
+        post = {'post_id': self.post.pk}
+        return [
+            ('index', 'get', {}, {}),
+            ('group_posts', 'get', {'slug': self.group.slug}, {}),
+            ('profile', 'get', {'username': author}, {}),
+            ('post_detail', 'get', post, {}),
+            ('post_create', 'get', {}, {}),
+            ('post_create', 'post', {}, {
+                'text': 'Новый пост', 'group': self.group.pk,
+                'image': SimpleUploadedFile('new.gif', GIF, 'image/gif'),
+            }),
+            ('post_edit', 'get', post, {}),
+            ('post_edit', 'post', post, {
+                'text': 'Правка', 'group': self.group.pk,
+                'image': SimpleUploadedFile('edit.gif', GIF, 'image/gif'),
+            }),
+            ('add_comment', 'post', post, {'text': 'Комментарий'}),
+            ('search', 'get', {}, {'q': 'пост'}),
+            ('follow_index', 'get', {}, {}),
+            ('profile_follow', 'get', {'username': author}, {}),
+            ('profile_unfollow', 'get', {'username': author}, {}),
+        ]
+
+    def test_every_url_declares_budget(self):
+        """У каждого адреса posts есть бюджет и проверочный запрос."""
+        checked = {name for name, *_ in self.cases()}
+        for pattern in urls.urlpatterns:
+            with self.subTest(url=pattern.name):
+                self.assertIsInstance(pattern.callback.query_budget, int)
+                self.assertIn(pattern.name, checked)
+
+    def test_urls_within_budget(self):
+        """Запросы с пустым кешем укладываются в бюджет, N+1 нет."""
+        for name, method, kwargs, data in self.cases():
+            with self.subTest(url=name, method=method):
+                cache.clear()
+                response = getattr(self.client, method)(
+                    reverse(f'posts:{name}', kwargs=kwargs), data
+                )
+                self.assertLess(response.status_code, 400)
+
+    @override_settings(FOLLOW_FEED_ENGINE=feeds.PULL_ENGINE)
+    def test_pull_feed_within_budget(self):
+        """Лента подписок в режиме pull тоже укладывается в бюджет."""
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 9)
@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.admin import PostAdmin
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.apple = Post.objects.create(
+            author=cls.author, text='Яблоки и груши <b>созрели</b>'
+        )
+        cls.apples = Post.objects.create(
+            author=cls.author, text='Яблоки, яблоки, яблоки'
+        )
+        Post.objects.create(author=cls.author, text='Про сливы')
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query, cursor=None):
+        data = {'q': query}
+        if cursor:
+            data['cursor'] = cursor
+        response = self.client.get(reverse('posts:search'), data)
+        return response.context['page_obj']
+
+    def test_results_are_ranked(self):
+        """Пост с большим числом совпадений выше в выдаче."""
+        page = self.found('яблоки')
+        self.assertEqual(list(page), [self.apples, self.apple])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        """Совпадения подсвечены, HTML из текста экранирован."""
+        page = self.found('груш')
+        self.assertEqual(list(page), [self.apple])
+        self.assertIn('<mark>груши</mark>', page[0].snippet)
+        self.assertIn('&lt;b&gt;', page[0].snippet)
+
+    def test_snippet_window(self):
+        """Отрывок - окно вокруг совпадений, регистр и ё не мешают."""
+        text = ' '.join(f'слово{number}' for number in range(40))
+        text += ' Ёлка и ЁЛКИ в конце.'
+        result = search.snippet(text, 'елк', tokens=6)
+        self.assertTrue(result.startswith('…'))
+        self.assertIn(f'{search.MARK_START}Ёлка{search.MARK_END}', result)
+        self.assertIn(f'{search.MARK_START}ЁЛКИ{search.MARK_END}', result)
+        self.assertTrue(result.endswith('конце.'))
+        self.assertEqual(search.snippet('Без совпадений', 'груш'),
+                         'Без совпадений')
+
+    def test_page_query_has_no_snippet(self):
+        """Отрывки строятся только для постов страницы, не в SQL."""
+        with CaptureQueriesContext(connection) as queries:
+            self.found('яблоки')
+        self.assertFalse(
+            any('snippet(' in query['sql'] for query in queries)
+        )
+
+    def test_query_syntax_is_not_passed_to_fts(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        page = self.found('яблоки" OR (NEAR')
+        self.assertEqual(len(page), 0)
+        self.assertEqual(len(self.found('')), 0)
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_keyset_pages(self):
+        """Страницы листаются по курсору вперёд и назад."""
+        first = self.found('яблоки')
+        second = self.found('яблоки', first.next_cursor)
+        self.assertEqual(list(second), [self.apple])
+        self.assertFalse(second.has_next())
+        back = self.found('яблоки', second.previous_cursor)
+        self.assertEqual(list(back), [self.apples])
+        self.assertEqual(back.number, 1)
+
+    def test_index_follows_edit_and_delete(self):
+        """Правка и удаление поста обновляют индекс."""
+        post = Post.objects.get(pk=self.apple.pk)
+        post.text = 'Теперь про абрикосы'
+        post.save()
+        self.assertEqual(list(self.found('абрикос')), [post])
+        self.assertEqual(list(self.found('груши')), [])
+        post.delete()
+        self.assertEqual(list(self.found('абрикос')), [])
+
+    def test_reindex_restores_index(self):
+        """Переиндексация пачками восстанавливает потерянный индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        out = StringIO()
+        call_command('reindex_search', '--batch-size=2', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(len(self.found('яблоки')), 2)
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт через индекс FTS5."""
+        queryset, use_distinct = PostAdmin(Post, None).get_search_results(
+            None, Post.objects.all(), 'слив'
+        )
+        self.assertFalse(use_distinct)
+        self.assertIn(search.TABLE, str(queryset.query))
+        self.assertEqual(queryset.count(), 1)
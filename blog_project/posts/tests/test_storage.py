@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts import counters
+from posts.models import MediaFile, Post
+from posts.storage import content_storage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def png(name='image.png', color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (20, 10), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ContentStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, image):
+        return Post.objects.create(
+            author=self.author, text='Пост', image=image
+        )
+
+    def references(self, name):
+        return MediaFile.objects.get(name=name).references
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые загрузки получают одно имя и один файл на диске."""
+        first = self.create(png('first.png'))
+        second = self.create(png('second.PNG'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.endswith('.png'))
+        directory = os.path.dirname(content_storage.path(first.image.name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(self.references(first.image.name), 2)
+
+    def test_different_content_gets_different_names(self):
+        """Разное содержимое лежит в разных файлах."""
+        red = self.create(png(color='red'))
+        blue = self.create(png(color='blue'))
+        self.assertNotEqual(red.image.name, blue.image.name)
+
+    def test_references_follow_edit_and_delete(self):
+        """Замена и удаление картинки сдвигают число ссылок."""
+        post = self.create(png(color='green'))
+        old = post.image.name
+        post.image = png(color='yellow')
+        post.save()
+        self.assertEqual(self.references(old), 0)
+        self.assertEqual(self.references(post.image.name), 1)
+        post.text = 'Без смены картинки'
+        post.save()
+        self.assertEqual(self.references(post.image.name), 1)
+        name = post.image.name
+        post.delete()
+        self.assertEqual(self.references(name), 0)
+        self.assertTrue(content_storage.exists(name))
+
+    def test_recount_restores_references(self):
+        """Пересчёт чинит сбитые и потерянные ссылки."""
+        post = self.create(png(color='white'))
+        MediaFile.objects.all().delete()
+        counters.recount()
+        self.assertEqual(self.references(post.image.name), 1)
+        MediaFile.objects.update(references=5)
+        self.assertEqual(counters.recount_files(), 1)
+        self.assertEqual(self.references(post.image.name), 1)
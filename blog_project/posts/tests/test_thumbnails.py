@@ -0,0 +1,143 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from core.cache_backends import TieredCache
+from posts import thumbnails
+from posts.models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def png(name='thumb.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (600, 400), 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._pending.clear()
+        self.post = Post.objects.create(
+            author=self.author, text='Пост с картинкой', image=png()
+        )
+
+    def test_render_does_not_generate(self):
+        """Рендеринг отдаёт оригинал и не вызывает Pillow."""
+        with mock.patch('sorl.thumbnail.engines.pil_engine.Engine.get_image',
+                        side_effect=AssertionError) as get_image:
+            response = self.client.get(
+                reverse('posts:post_detail', args=[self.post.pk])
+            )
+        get_image.assert_not_called()
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(thumbnails.ready_thumbnail(
+            self.post.image, **thumbnails.POST_OPTIONS
+        ))
+
+    def test_render_schedules_missing_thumbnail(self):
+        """Недостающая миниатюра ставится в очередь один раз."""
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            for _ in range(2):
+                self.client.get(
+                    reverse('posts:post_detail', args=[self.post.pk])
+                )
+        self.assertEqual(on_commit.call_count, 1)
+
+    def test_generated_thumbnail_is_rendered(self):
+        """После генерации страница показывает миниатюру."""
+        options = tuple(sorted(thumbnails.POST_OPTIONS.items()))
+        thumbnails.generate(
+            self.post.image.name, thumbnails.POST_GEOMETRY, options
+        )
+        thumbnail = thumbnails.ready_thumbnail(
+            self.post.image, **thumbnails.POST_OPTIONS
+        )
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(thumbnail.width, 300)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertContains(response, thumbnail.url)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class PageThumbnailTests(TestCase):
+    POSTS = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        options = tuple(sorted(thumbnails.POST_OPTIONS.items()))
+        self.posts = []
+        for number in range(self.POSTS):
+            post = Post.objects.create(
+                author=self.author, text=f'Пост {number}',
+                image=png(f'page{number}.png')
+            )
+            thumbnails.generate(
+                post.image.name, thumbnails.POST_GEOMETRY, options
+            )
+            self.posts.append(post)
+        cache.clear()
+
+    def test_index_looks_up_thumbnails_once(self):
+        """Главная ищет миниатюры страницы одним запросом и одним get_many."""
+        prefix = 'sorl-thumbnail'
+        with mock.patch.object(
+            TieredCache, 'get', autospec=True, side_effect=TieredCache.get
+        ) as get, mock.patch.object(
+            TieredCache, 'get_many', autospec=True,
+            side_effect=TieredCache.get_many
+        ) as get_many, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertFalse([
+            call for call in get.call_args_list
+            if str(call.args[1]).startswith(prefix)
+        ])
+        self.assertEqual(len([
+            call for call in get_many.call_args_list
+            if str(list(call.args[1])[0]).startswith(prefix)
+        ]), 1)
+        for post in self.posts:
+            thumbnail = thumbnails.ready_thumbnail(
+                post.image, **thumbnails.POST_OPTIONS
+            )
+            self.assertContains(response, thumbnail.url)
@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, features
+
+from posts import variants
+from posts.models import ImageVariant, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def png(name='variant.png', size=(900, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_ASYNC=False,
+    IMAGE_VARIANT_WIDTHS=(300, 600, 1200),
+)
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_variants_are_built_without_upscale(self):
+        """Варианты строятся по ширинам не больше оригинала."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=png()
+        )
+        variants.build_variants(post.pk)
+        jpeg = post.variants.filter(format=ImageVariant.JPEG)
+        self.assertEqual(
+            list(jpeg.values_list('width', 'height')),
+            [(300, 200), (600, 400), (900, 600)]
+        )
+        self.assertEqual(
+            post.variants.filter(format=ImageVariant.WEBP).exists(),
+            features.check('webp')
+        )
+        with Image.open(jpeg.first().image) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (300, 200)))
+
+    def test_rebuild_replaces_variants(self):
+        """Повторная сборка заменяет прежние варианты."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=png(size=(200, 100))
+        )
+        variants.build_variants(post.pk)
+        variants.build_variants(post.pk)
+        self.assertEqual(
+            post.variants.count(), len(variants.formats())
+        )
+
+    def test_upload_schedules_variants(self):
+        """Сохранение формы с картинкой строит варианты после фиксации."""
+        callbacks = []
+        with mock.patch('django.db.transaction.on_commit',
+                        side_effect=callbacks.append):
+            self.client.post(
+                reverse('posts:post_create'),
+                data={'text': 'С картинкой', 'image': png('upload.png')},
+            )
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        post = Post.objects.get(text='С картинкой')
+        self.assertTrue(post.variants.filter(
+            format=ImageVariant.JPEG, width=300
+        ).exists())
+
+    def test_feed_renders_srcset(self):
+        """Лента отдаёт варианты через srcset."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=png()
+        )
+        variants.build_variants(post.pk)
+        response = self.client.get(reverse('posts:index'))
+        for variant in post.variants.filter(format=ImageVariant.JPEG):
+            self.assertContains(
+                response, f'{variant.image.url} {variant.width}w'
+            )
+        self.assertContains(response, 'srcset=')
@@ -277,17 +277,31 @@ class PostURLTests(TestCase):
                     self.assertEqual(post_test.image, post_from_server.image)
 
     def test_cache_index(self):
-        '''пост в кеше'''
+        '''пост в кеше, пока лента не изменилась'''
         post_test = Post.objects.create(
             author=PostURLTests.author,
             text='Специальный пост для тестов',
         )
         response_1 = self.guest_client.get(reverse('posts:index'))
-        post_test.delete()
+        # update() не шлёт сигналов, поэтому версия ленты не меняется
+        Post.objects.filter(pk=post_test.pk).update(text='Изменённый пост')
         response_2 = self.guest_client.get(reverse('posts:index'))
 
         self.assertEqual(response_1.content, response_2.content)
 
+    def test_cache_index_invalidated_on_delete(self):
+        '''удаление поста сразу сбрасывает кеш главной'''
+        post_test = Post.objects.create(
+            author=PostURLTests.author,
+            text='Пост, который удалят',
+        )
+        response_1 = self.guest_client.get(reverse('posts:index'))
+        post_test.delete()
+        response_2 = self.guest_client.get(reverse('posts:index'))
+
+        self.assertContains(response_1, post_test.text)
+        self.assertNotContains(response_2, post_test.text)
+
     def test_following(self):
         '''
         Авторизованный пользователь может подписываться на
@@ -0,0 +1,223 @@
+"""Миниатюры картинок постов, которые строятся вне запроса.
+
+Рендеринг только ищет готовую миниатюру в хранилище sorl и никогда не
+вызывает Pillow; отсутствующие миниатюры строят фоновые потоки процесса.
+Тот же пул строит варианты картинок (posts.variants).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import metrics, timing
+
+from .models import ImageVariant
+from .storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+POST_GEOMETRY = '300x300'
+POST_OPTIONS = {'crop': 'center', 'upscale': False}
+
+PENDING_TIMEOUT = 60
+
+_executor = None
+_pending = {}
+_lock = threading.Lock()
+
+
+class LookupBackend(ThumbnailBackend):
+    """Бэкенд sorl, который ищет готовую миниатюру и ничего не строит."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры с тем же именем, что построит sorl."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+
+lookup_backend = LookupBackend()
+
+
+def ready_thumbnail(file_, geometry=POST_GEOMETRY, **options):
+    """Готовая миниатюра или None, если её ещё нет."""
+    if not file_:
+        return None
+    with timing.measure('thumbnails'):
+        return lookup_backend.get_thumbnail(file_, geometry, **options)
+
+
+def ready_thumbnails(files, geometry=POST_GEOMETRY, **options):
+    """Готовые миниатюры для нескольких картинок: имя файла -> миниатюра.
+
+    Вместо запроса на каждую картинку делает один get_many к кешу sorl и
+    один запрос к его таблице за ключами, которых нет в кеше.
+    """
+    with timing.measure('thumbnails'):
+        return _ready_thumbnails(files, geometry, **options)
+
+
+def _ready_thumbnails(files, geometry, **options):
+    thumbnails = {
+        file_.name: lookup_backend.thumbnail_file(file_, geometry, **options)
+        for file_ in files if file_
+    }
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {
+            name: kvstore.get(thumbnail)
+            for name, thumbnail in thumbnails.items()
+        }
+    keys = {
+        add_prefix(thumbnail.key): name
+        for name, thumbnail in thumbnails.items()
+    }
+    values = kvstore.cache.get_many(list(keys)) if keys else {}
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        # Как и sorl, запоминаем отсутствие миниатюры, чтобы не ходить в БД
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        name: (
+            None if values[key] == EMPTY_VALUE
+            else deserialize_image_file(values[key])
+        )
+        for key, name in keys.items()
+    }
+
+
+class PageThumbnails:
+    """Миниатюры и варианты картинок постов страницы, найденные пакетом.
+
+    Поиск откладывается до первого обращения из шаблона, поэтому при
+    попадании во фрагментный кеш он не выполняется вовсе.
+    """
+
+    def __init__(self, posts, geometry=POST_GEOMETRY, **options):
+        self.posts = posts
+        self.geometry = geometry
+        self.options = options or POST_OPTIONS
+        self._thumbnails = None
+        self._variants = None
+
+    def variants(self, post):
+        """Варианты картинки поста; один запрос на всю страницу."""
+        if self._variants is None:
+            self._variants = {}
+            for variant in ImageVariant.objects.filter(
+                post_id__in=[post.pk for post in self.posts if post.image]
+            ):
+                self._variants.setdefault(variant.post_id, []).append(variant)
+        return self._variants.get(post.pk, [])
+
+    def get(self, post):
+        if not post.image:
+            return None
+        if self._thumbnails is None:
+            self._thumbnails = ready_thumbnails(
+                [post.image for post in self.posts],
+                self.geometry, **self.options
+            )
+        if post.image.name not in self._thumbnails:
+            self._thumbnails.update(ready_thumbnails(
+                [post.image], self.geometry, **self.options
+            ))
+        thumbnail = self._thumbnails[post.image.name]
+        if thumbnail is None:
+            schedule(post.image, self.geometry, **self.options)
+        return thumbnail
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails'
+            )
+    return _executor
+
+
+def generate(name, geometry, options, storage=content_storage):
+    try:
+        default.backend.get_thumbnail(
+            ImageFile(name, storage), geometry, **dict(options)
+        )
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', name)
+        result = 'error'
+    else:
+        result = 'ok'
+    finally:
+        with _lock:
+            _pending.pop((name, geometry, options), None)
+    metrics.inc(
+        'thumbnails_generated_total', {'kind': 'thumbnail', 'result': result}
+    )
+
+
+def _run_in_worker(func, *args):
+    try:
+        func(*args)
+    finally:
+        connections.close_all()
+
+
+def defer(func, *args):
+    """Вызывает func(*args) в фоновом потоке после фиксации транзакции.
+
+    Задача уходит после фиксации, чтобы поток видел сохранённые файл
+    и строки. При THUMBNAIL_ASYNC = False вызов синхронный.
+    """
+    def submit():
+        if settings.THUMBNAIL_ASYNC:
+            _get_executor().submit(_run_in_worker, func, *args)
+        else:
+            func(*args)
+    transaction.on_commit(submit)
+
+
+def schedule(file_, geometry=POST_GEOMETRY, **options):
+    """Ставит миниатюру в очередь фоновых потоков, если её там нет."""
+    if not file_:
+        return
+    options = tuple(sorted((options or POST_OPTIONS).items()))
+    task = (file_.name, geometry, options)
+    now = time.monotonic()
+    with _lock:
+        # Задача, отменённая откатом транзакции, не должна висеть вечно
+        if now - _pending.get(task, -PENDING_TIMEOUT) < PENDING_TIMEOUT:
+            return
+        _pending[task] = now
+    defer(generate, *task, file_.storage)
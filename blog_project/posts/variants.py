@@ -0,0 +1,162 @@
+"""Варианты картинки поста нескольких ширин в JPEG и WebP.
+
+Варианты строятся один раз после загрузки, в фоновом потоке, и
+записываются в ImageVariant; шаблоны отдают их через srcset и никогда
+не обрабатывают картинки сами.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from core import metrics
+
+from . import thumbnails
+from .caching import bump_feed_version, post_scopes
+from .models import ImageVariant, Post
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {
+    ImageVariant.JPEG: 'jpg',
+    ImageVariant.WEBP: 'webp',
+}
+
+
+def formats():
+    if features.check('webp'):
+        return (ImageVariant.WEBP, ImageVariant.JPEG)
+    return (ImageVariant.JPEG,)
+
+
+def _save_options(format_):
+    if format_ == ImageVariant.WEBP:
+        return {'quality': settings.IMAGE_VARIANT_QUALITY, 'method': 4}
+    return {
+        'quality': settings.IMAGE_VARIANT_QUALITY,
+        'optimize': True,
+        'progressive': True,
+    }
+
+
+def _encode(image, format_):
+    buffer = BytesIO()
+    image.save(buffer, format_.upper(), **_save_options(format_))
+    return buffer.getvalue()
+
+
+def variant_widths(width):
+    """Ширины вариантов для картинки ширины width, без увеличения."""
+    return sorted({min(size, width) for size in settings.IMAGE_VARIANT_WIDTHS})
+
+
+def build_variants(post_id):
+    """Строит и записывает варианты картинки поста, заменяя прежние."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author_id', 'group_id'
+    ).first()
+    if post is None or not post.image:
+        return []
+    name = post.image.name
+    variants = _shared_variants(post, name)
+    if not variants:
+        variants = _encode_variants(post)
+    with transaction.atomic():
+        # Пока строили, картинку могли заменить: её варианты построит
+        # задача, поставленная той правкой.
+        if not Post.objects.filter(pk=post_id, image=name).exists():
+            return []
+        ImageVariant.objects.filter(post_id=post_id).delete()
+        ImageVariant.objects.bulk_create(variants)
+    # Закешированные карточки поста ещё без srcset
+    bump_feed_version(*post_scopes(post.author_id, post.group_id))
+    return variants
+
+
+def _shared_variants(post, name):
+    """Копии строк вариантов другого поста с той же картинкой.
+
+    Хранилище адресуется по содержимому, так что одинаковые загрузки
+    получают одно имя файла и могут делить уже построенные варианты.
+    """
+    donor = ImageVariant.objects.filter(post__image=name).exclude(
+        post_id=post.pk
+    ).values_list('post_id', flat=True).first()
+    if donor is None:
+        return []
+    return [
+        ImageVariant(
+            post=post, format=variant.format, width=variant.width,
+            height=variant.height, image=variant.image.name
+        )
+        for variant in ImageVariant.objects.filter(post_id=donor)
+    ]
+
+
+def _encode_variants(post):
+    with post.image.open('rb') as file_, Image.open(file_) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+    base = os.path.splitext(os.path.basename(post.image.name))[0]
+    variants = []
+    for width in variant_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize(
+            (width, height), Image.LANCZOS
+        )
+        for format_ in formats():
+            variant = ImageVariant(
+                post=post, format=format_, width=width, height=height
+            )
+            variant.image.save(
+                f'{base}-{width}w.{EXTENSIONS[format_]}',
+                ContentFile(_encode(resized, format_)),
+                save=False
+            )
+            variants.append(variant)
+    return variants
+
+
+def _build_quietly(post):
+    try:
+        build_variants(post.pk)
+    except Exception:
+        logger.exception('Не удалось построить варианты поста %s', post.pk)
+        result = 'error'
+    else:
+        result = 'ok'
+    metrics.inc(
+        'thumbnails_generated_total', {'kind': 'variants', 'result': result}
+    )
+
+
+def schedule(post):
+    """Ставит построение вариантов в очередь после фиксации транзакции.
+
+    pk читается уже в задаче: форма с commit=False отдаёт пост без него.
+    """
+    thumbnails.defer(_build_quietly, post)
+
+
+def picture(variants):
+    """Данные для <picture>: srcset по форматам и картинка по умолчанию."""
+    sources = {}
+    for variant in variants:
+        sources.setdefault(variant.format, []).append(variant)
+    jpeg = sources.get(ImageVariant.JPEG)
+    if not jpeg:
+        return None
+    return {
+        'fallback': jpeg[0],
+        'jpeg_srcset': _srcset(jpeg),
+        'webp_srcset': _srcset(sources.get(ImageVariant.WEBP, [])),
+    }
+
+
+def _srcset(variants):
+    return ', '.join(
+        f'{variant.image.url} {variant.width}w' for variant in variants
+    )
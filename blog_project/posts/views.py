@@ -1,25 +1,46 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import (get_object_or_404, redirect, render)
-from django.views.decorators.cache import cache_page
 
-from yatube.settings import POSTS_PER_PAGE, TITLE_SYMBOLS
+from core import writes
+from core.queries import query_budget
 
+from . import feeds, search, thumbnails
+from .caching import (ALL_POSTS, author_scope, cache_feed_page,
+                      conditional_feed, follow_scope, fragment_context,
+                      group_scope, group_state, index_state, post_state,
+                      profile_state)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Follow, Group, Post
+from .pagination import (CURSOR_MODE, CursorPaginator,
+                         SequenceCursorPaginator)
 
 User = get_user_model()
 
 
-def paginator(request, posts):
-    paginator = Paginator(posts, POSTS_PER_PAGE)
+def paginator(request, posts, **cursor_fields):
+    if settings.POSTS_PAGINATION == CURSOR_MODE:
+        if isinstance(posts, list):
+            cursor_paginator = SequenceCursorPaginator(
+                posts, settings.POSTS_PER_PAGE
+            )
+        else:
+            cursor_paginator = CursorPaginator(
+                posts, settings.POSTS_PER_PAGE, **cursor_fields
+            )
+        return cursor_paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
-@cache_page(20, key_prefix='index_page')
+@query_budget(7)
+@conditional_feed(index_state)
+@cache_feed_page(settings.FEED_PAGE_TIMEOUT, ALL_POSTS)
 def index(request):
     posts = Post.objects.select_related('group', 'author').all()
     page_obj = paginator(request, posts)
@@ -29,10 +50,15 @@ def index(request):
         'title': title,
         'posts': posts,
         'page_obj': page_obj,
+        'post_thumbnails': thumbnails.PageThumbnails(page_obj),
+        **fragment_context(ALL_POSTS),
     }
     return render(request, template, context)
 
 
+@query_budget(8)
+@conditional_feed(group_state)
+@cache_feed_page(settings.FEED_PAGE_TIMEOUT, group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author').all()
@@ -42,13 +68,20 @@ def group_posts(request, slug):
         'group': group,
         'posts': posts,
         'page_obj': page_obj,
+        'post_thumbnails': thumbnails.PageThumbnails(page_obj),
+        **fragment_context(group_scope(slug)),
     }
     return render(request, template, context)
 
 
+@query_budget(9)
+@conditional_feed(profile_state)
+@cache_feed_page(settings.FEED_PAGE_TIMEOUT, author_scope)
 def profile(request, username):
     following = False
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     posts = author.posts.select_related('group').all()
     page_obj = paginator(request, posts)
     template = 'posts/profile.html'
@@ -67,17 +100,25 @@ def profile(request, username):
         'username': author,
         'posts': posts,
         'page_obj': page_obj,
-        'following': following
+        'post_thumbnails': thumbnails.PageThumbnails(page_obj),
+        'following': following,
+        **fragment_context(author_scope(username)),
     }
     return render(request, template, context)
 
 
+@query_budget(7)
+@conditional_feed(post_state)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    author_posts = post.author.posts.count()
-    title = post.text[:TITLE_SYMBOLS]
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    author_posts = post.author.stats.post_count
+    title = post.text[:settings.TITLE_SYMBOLS]
     template = 'posts/post_detail.html'
-    comments = post.comments.all()
+    comments = post.comments.select_related('author').order_by(
+        'pub_date'
+    )
     form = CommentForm()
     context = {
         'title': title,
@@ -89,6 +130,7 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@query_budget(17)
 @login_required
 def post_create(request):
     is_edit = False
@@ -98,18 +140,20 @@ def post_create(request):
         files=request.FILES or None,
     )
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post = form.save(commit=False)
+            post.author = request.user
+            post.save()
         return redirect('posts:profile', request.user.username)
     context = {'form': form, 'is_edit': is_edit}
     return render(request, template, context)
 
 
+@query_budget(17)
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     is_edit = True
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id)
     template = 'posts/create_post.html'
     form = PostForm(
@@ -118,36 +162,68 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        post = form.save()
+        with transaction.atomic():
+            post = form.save()
         return redirect('posts:post_detail', post_id)
     context = {'form': form, 'is_edit': is_edit, 'post': post}
     return render(request, template, context)
 
 
+@query_budget(8)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        writes.submit(
+            Comment.objects.create,
+            post=post,
+            author=request.user,
+            text=form.cleaned_data['text'],
+        )
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(6)
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search.SearchPaginator(
+        query, settings.POSTS_PER_PAGE
+    ).get_page(request.GET.get('cursor'))
+    template = 'posts/search.html'
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'post_thumbnails': thumbnails.PageThumbnails(page_obj),
+    }
+    return render(request, template, context)
+
+
+@query_budget(7)
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request, posts)
+    if settings.FOLLOW_FEED_ENGINE == feeds.PULL_ENGINE:
+        page_obj = feeds.load_posts(
+            paginator(request, feeds.pull_keys(request.user))
+        )
+        posts = page_obj.object_list
+    else:
+        posts = feeds.feed_posts(
+            request.user,
+            cursor=settings.POSTS_PAGINATION == CURSOR_MODE,
+        )
+        page_obj = paginator(request, posts, **feeds.FEED_CURSOR)
     context = {
         'posts': posts,
         'page_obj': page_obj,
+        'post_thumbnails': thumbnails.PageThumbnails(page_obj),
+        **fragment_context(ALL_POSTS, follow_scope(request.user.id)),
     }
     return render(request, template, context)
 
 
+@query_budget(13)
 @login_required
 def profile_follow(request, username):
     author_followed = get_object_or_404(User, username=username)
@@ -156,10 +232,15 @@ def profile_follow(request, username):
         author=author_followed
     )
     if request.user != author_followed and not follow_instance.exists():
-        Follow.objects.create(user=request.user, author=author_followed)
+        writes.submit(
+            Follow.objects.get_or_create,
+            user=request.user,
+            author=author_followed,
+        )
     return redirect('posts:follow_index')
 
 
+@query_budget(10)
 @login_required
 def profile_unfollow(request, username):
     author_followed = get_object_or_404(User, username=username)
@@ -168,5 +249,5 @@ def profile_unfollow(request, username):
         author=author_followed
     )
     if follow_instance.exists():
-        follow_instance.delete()
+        writes.submit(follow_instance.delete)
     return redirect('posts:follow_index')
@@ -12,6 +12,13 @@ def mock_media(settings):
         yield temp_directory
 
 
+@pytest.fixture(autouse=True)
+def sync_background_tasks(settings):
+    # Фоновые потоки миниатюр переживают тест и пишут в удаляемые
+    # MEDIA_ROOT и базу, поэтому в тестах задачи выполняются сразу
+    settings.THUMBNAIL_ASYNC = False
+
+
 @pytest.fixture
 def mixer():
     return _mixer